@@ -0,0 +1,115 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from concept_index import ConceptIndex
+from fluctuation import getChangesAsync
+from get_changes_worker_queue import ChangesCycle, get_resource_path, load_concepts
+from http_client import AsyncHTTPClient
+from scheduler import TradingCalendar
+from supervisor import Heartbeat, format_timestamp
+
+
+class AsyncIngestor:
+    """在 API 进程的事件循环中轮询异动，代替 get_changes_worker_queue 的 worker 进程
+
+    HTTP 请求在事件循环中非阻塞地发出；构建 DataFrame、编码、写事件日志和落盘交给 workers 个线程，
+    快照由 publish(rows, payload) 直接进入广播、新事件由 publish_events(rows) 进入当日索引，
+    不经过跨进程队列和共享内存，也不需要第二个解释器。
+    每轮的处理与 worker 共用 get_changes_worker_queue.ChangesCycle，两种模式可以直接对比。
+    """
+
+    def __init__(self, concept_source, publish, publish_events=None, interval=3, batch_interval=300, batch_size=100,
+                 workers=2, static_dir=None):
+        self.concept_source = concept_source
+        self.publish = publish
+        self.publish_events = publish_events
+        self.interval = interval
+        self.batch_interval = batch_interval
+        self.batch_size = batch_size
+        self.workers = workers
+        self.static_dir = static_dir or get_resource_path("static")
+        self.heartbeat = Heartbeat()
+        self.state = "stopped"
+        self.started_at = None
+        self.last_error = None
+        self.http_backend = None
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+        client = AsyncHTTPClient()
+        self.http_backend = client.backend
+        self.state = "running"
+        self.started_at = time.time()
+        print(f"[async_ingest] 启动，在事件循环中轮询（HTTP: {client.backend}）", flush=True)
+        cycle = None
+
+        def publish(rows, payload):
+            # handle 在线程池中运行，广播回到事件循环线程
+            loop.call_soon_threadsafe(self.publish, rows, payload)
+
+        def publish_events(rows):
+            if self.publish_events is not None:
+                loop.call_soon_threadsafe(self.publish_events, rows)
+
+        try:
+            # 板块索引只在启动时构建一次
+            concept_index = await loop.run_in_executor(
+                executor, lambda: ConceptIndex.from_frame(load_concepts(self.concept_source))
+            )
+            cycle = ChangesCycle(
+                self.static_dir, concept_index,
+                TradingCalendar.load(get_resource_path("akshare/file_fold/calendar.json")), publish, publish_events,
+                interval=self.interval, batch_interval=self.batch_interval, batch_size=self.batch_size,
+                heartbeat=self.heartbeat, name="async_ingest",
+            )
+            await loop.run_in_executor(executor, cycle.start)
+            while True:
+                started = time.monotonic()
+                result, new_events = "error", 0
+                try:
+                    df = await getChangesAsync(client, concept_index, executor)
+                    result, new_events = await loop.run_in_executor(executor, cycle.handle, df)
+                except Exception as e:
+                    self.last_error = str(e)
+                    print(f"[async_ingest] getChanges错误: {e}", flush=True)
+                delay = await loop.run_in_executor(
+                    executor, cycle.finish, result, time.monotonic() - started, new_events
+                )
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.state = "stopped"
+            raise
+        except Exception as e:
+            self.state = "failed"
+            self.last_error = str(e)
+            print(f"[async_ingest] 轮询任务退出: {e}", flush=True)
+            raise
+        finally:
+            # 任务被取消（API 进程退出）时等线程池里的一轮结束，再落盘最新的 changes 表并关闭事件日志
+            await asyncio.to_thread(self._shutdown, executor, cycle)
+            await client.aclose()
+
+    @staticmethod
+    def _shutdown(executor, cycle):
+        executor.shutdown(wait=True, cancel_futures=True)
+        if cycle is not None:
+            cycle.close()
+
+    def status(self):
+        """与 supervisor.ManagedWorker.status 相同的字段，pid 为 API 进程本身"""
+        status = {
+            "name": "getChanges",
+            "mode": "async",
+            "state": self.state,
+            "pid": os.getpid(),
+            "started_at": format_timestamp(self.started_at),
+            "restarts": 0,
+            "exit_code": None,
+            "last_error": self.last_error,
+            "http": self.http_backend,
+        }
+        status.update(self.heartbeat.status())
+        return status
@@ -0,0 +1,2 @@
+# Performance benchmarks for the backend. Run from the backend directory, e.g.
+#   python -m benchmarks.format_changes
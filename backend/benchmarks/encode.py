@@ -0,0 +1,51 @@
+"""每个 tick 的编码开销与客户端数量的关系
+
+    python -m benchmarks.encode [--rows 5000] [--clients 1,10,50]
+
+legacy：每个客户端各自 json.dumps 一次整张列表（重构前的 /ws/changes）。
+shared：每个 tick 只构建一次 Snapshot，所有客户端共用同一份帧。
+"""
+import argparse
+import json
+import time
+
+import fastjson
+from changes_hub import Snapshot
+from benchmarks.storage import synthetic_changes
+
+
+def per_tick(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--clients', default='1,10,50')
+    args = parser.parse_args()
+
+    rows = synthetic_changes(args.rows).to_dict(orient='records')
+    clients = [int(n) for n in args.clients.split(',')]
+    encoder = 'orjson' if fastjson.orjson is not None else 'stdlib'
+    print(f"rows={len(rows)} encoder={encoder} bytes={len(fastjson.dumps(rows))}")
+    print(f"{'clients':>8} {'legacy ms':>10} " + " ".join(f"{fmt + ' ms':>12}" for fmt in fastjson.supported_formats()))
+
+    for n in clients:
+        legacy = per_tick(lambda: [json.dumps(rows, ensure_ascii=False) for _ in range(n)])
+        shared = []
+        for fmt in fastjson.supported_formats():
+            def tick():
+                snapshot = Snapshot(1, rows, rows, [])
+                for _ in range(n):
+                    snapshot.frame('full', fmt)
+            shared.append(per_tick(tick))
+        print(f"{n:>8} {legacy:>10.2f} " + " ".join(f"{ms:>12.2f}" for ms in shared))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""本地的 eastmoney 替身服务器，按设定的速率产生（或回放）异动并模拟延迟
+
+    python -m benchmarks.fake_eastmoney [--port 18080] [--rate 20] [--initial 2000] [--latency 0.05]
+                                        [--order desc] [--replay events.json]
+
+提供 getAllStockChanges（JSONP，按 pageindex/pagesize 分页）和 clist/get（上涨板块）两个接口。
+让 sidecar 使用它：
+
+    EASTMONEY_CHANGES_URL=http://127.0.0.1:18080/getAllStockChanges \\
+    EASTMONEY_CLIST_URL=http://127.0.0.1:18080/api/qt/clist/get python main.py
+
+--replay 接受录制的事件列表（allstock 数组）或完整的 JSONP 响应，按 --rate 依次放出。
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import fastjson
+from fluctuation import CHANGES_TYPES, parse_jsonp
+
+TYPES = [int(t) for t in CHANGES_TYPES.split(',')]
+SESSION_START = 9 * 3600 + 30 * 60
+SESSION_END = 14 * 3600 + 59 * 60 + 59
+
+
+def load_replay(path):
+    """读取录制的事件：allstock 数组，或 getAllStockChanges 的 JSON/JSONP 响应"""
+    with open(path, 'rb') as f:
+        data = parse_jsonp(f.read())
+    if isinstance(data, dict):
+        data = (data.get('data') or {}).get('allstock') or []
+    # 按时间升序放出
+    return sorted(data, key=lambda row: int(row.get('tm', 0)))
+
+
+class FakeEastmoney:
+    """在后台线程运行的替身服务器
+
+    boards 为 [(板块代码, 板块名称, [股票代码...])]，合成的事件只使用这些股票，
+    上涨板块也从这些板块中选出，保证 ConceptIndex 能够命中。
+    """
+
+    def __init__(self, boards, rate=20.0, initial=2000, latency=0.0, jitter=0.0, order='desc',
+                 replay=None, seed=0, host='127.0.0.1', port=0):
+        self.boards = boards
+        self.stocks = sorted({stock for _, _, stocks in boards for stock in stocks})
+        self.rate = rate
+        self.initial = initial
+        self.latency = latency
+        self.jitter = jitter
+        self.order = order
+        self.replay = replay
+        self.rng = random.Random(seed)
+        self.events = []  # 时间升序
+        self.requests = {'changes': 0, 'clist': 0}
+        self._lock = threading.Lock()
+        self._started = None
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def changes_url(self):
+        return f'{self.base_url}/getAllStockChanges'
+
+    @property
+    def clist_url(self):
+        return f'{self.base_url}/api/qt/clist/get'
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-eastmoney', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _synthetic_event(self, index):
+        code = self.rng.choice(self.stocks)
+        # 模拟时钟：每个事件前进 1 秒，收盘后停在 14:59:59
+        seconds = min(SESSION_START + index, SESSION_END)
+        tm = (seconds // 3600) * 10000 + (seconds // 60 % 60) * 100 + seconds % 60
+        pct = self.rng.uniform(0.01, 0.15) * self.rng.choice((1, -1))
+        price = self.rng.uniform(3, 80)
+        return {
+            'tm': tm, 'c': code, 'm': 0 if code.startswith(('0', '3')) else 1,
+            'n': f'股票{code}', 't': self.rng.choice(TYPES), 'i': f'{pct:.4f},{price:.2f},{price * pct:.2f}',
+        }
+
+    def current_events(self):
+        """到目前为止已经“发生”的事件，时间升序"""
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        target = self.initial + int(elapsed * self.rate)
+        with self._lock:
+            if self.replay is not None:
+                target = min(target, len(self.replay))
+                if len(self.events) < target:
+                    self.events.extend(self.replay[len(self.events):target])
+            else:
+                while len(self.events) < target:
+                    self.events.append(self._synthetic_event(len(self.events)))
+            return list(self.events)
+
+    def changes_body(self, query):
+        events = self.current_events()
+        if self.order == 'desc':
+            events.reverse()
+        pageindex = int(query.get('pageindex', ['0'])[0])
+        pagesize = int(query.get('pagesize', ['1000'])[0])
+        page = events[pageindex * pagesize:(pageindex + 1) * pagesize]
+        body = fastjson.dumps({'rc': 0, 'data': {'tc': len(events), 'allstock': page}})
+        callback = query.get('cb', [''])[0]
+        return f'{callback}('.encode() + body + b');' if callback else body
+
+    def clist_body(self, query):
+        # 板块涨幅随时间缓慢变化，每 10 秒换一次排名
+        bucket = int((time.monotonic() - (self._started or 0)) // 10)
+        rng = random.Random(bucket)
+        diff = [
+            {'f3': round(rng.uniform(-5, 5), 2), 'f12': code, 'f14': name, 'f20': rng.randrange(10 ** 10, 10 ** 12)}
+            for code, name, _ in self.boards
+        ]
+        diff.sort(key=lambda row: row['f3'], reverse=True)
+        size = int(query.get('pz', ['200'])[0])
+        return fastjson.dumps({'rc': 0, 'data': {'total': len(diff), 'diff': diff[:size]}})
+
+    def _delay(self):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive，与真实服务器一样复用连接
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+                if url.path == '/getAllStockChanges':
+                    fake.requests['changes'] += 1
+                    body, content_type = fake.changes_body(query), 'application/javascript; charset=UTF-8'
+                elif url.path == '/api/qt/clist/get':
+                    fake.requests['clist'] += 1
+                    body, content_type = fake.clist_body(query), 'application/json; charset=UTF-8'
+                else:
+                    self.send_error(404)
+                    return
+                fake._delay()
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def synthetic_boards(concepts_rows=100000, seed=0):
+    """与 benchmarks.storage.synthetic_concepts 相同的板块表，返回 (boards, concepts DataFrame)"""
+    from benchmarks.storage import synthetic_concepts
+    concept_df = synthetic_concepts(concepts_rows, seed)
+    boards = [
+        (code, group['板块名称'].iloc[0], group['股票代码'].tolist())
+        for code, group in concept_df.groupby('板块代码', sort=True)
+    ]
+    return boards, concept_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--rate', type=float, default=20.0, help='events per second')
+    parser.add_argument('--initial', type=int, default=2000, help='events already present at start')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--order', choices=('asc', 'desc'), default='desc')
+    parser.add_argument('--replay', help='recorded allstock events (JSON or JSONP)')
+    parser.add_argument('--concepts', type=int, default=100000, help='rows of the synthetic concepts table')
+    args = parser.parse_args()
+
+    boards, _ = synthetic_boards(args.concepts)
+    replay = load_replay(args.replay) if args.replay else None
+    fake = FakeEastmoney(boards, rate=args.rate, initial=args.initial, latency=args.latency, jitter=args.jitter,
+                         order=args.order, replay=replay, host=args.host, port=args.port).start()
+    print(json.dumps({'changes_url': fake.changes_url, 'clist_url': fake.clist_url}, ensure_ascii=False), flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == '__main__':
+    main()
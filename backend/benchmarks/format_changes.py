@@ -0,0 +1,97 @@
+"""getChanges 输出格式化阶段的微基准：逐行 apply 实现 vs 整列运算实现
+
+    python -m benchmarks.format_changes [--events 10000] [--repeat 20]
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from fluctuation import TYPE_MAPPING, format_changes
+
+
+def synthetic_day(events: int, seed: int = 0):
+    """生成一天的过滤后异动和股票→板块映射"""
+    rng = random.Random(seed)
+    stocks = [f"{rng.randrange(0, 700000):06d}" for _ in range(4000)]
+    concepts = [f"板块{i}" for i in range(400)]
+    first_concepts = {code: rng.choice(concepts) for code in stocks if rng.random() < 0.95}
+    sessions = [(9 * 3600 + 25 * 60, 11 * 3600 + 30 * 60), (13 * 3600, 15 * 3600)]
+    rows = []
+    for _ in range(events):
+        start, end = rng.choice(sessions)
+        seconds = rng.randrange(start, end)
+        tm = (seconds // 3600) * 10000 + (seconds // 60 % 60) * 100 + seconds % 60
+        pct = rng.choice([-1, 1]) * rng.uniform(0.05, 0.2)
+        code = rng.choice(stocks)
+        rows.append({
+            '股票代码': code,
+            '时间': tm,
+            '股票名称': f"股票{code}",
+            '类型': int(rng.choice(list(TYPE_MAPPING))),
+            '涨跌幅': round(pct, 4),
+        })
+    return pd.DataFrame(rows), first_concepts
+
+
+def legacy_format_changes(df: pd.DataFrame, first_concepts: dict) -> pd.DataFrame:
+    """重构前 getChanges 中的逐行实现，仅用于对比"""
+    def format_time(tm):
+        tm_str = str(tm)
+        if len(tm_str) < 6:
+            tm_str = tm_str.zfill(6)
+        return f"{tm_str[:2]}:{tm_str[2:4]}"
+
+    output_df = pd.DataFrame()
+    output_df['股票代码'] = df['股票代码']
+    output_df['时间'] = df['时间'].apply(format_time)
+    output_df['名称'] = df['股票名称']
+    output_df['类型'] = df['类型'].astype(str).map(TYPE_MAPPING).fillna('未知类型')
+    output_df['四舍五入取整'] = df['涨跌幅'].apply(lambda x: int(round(x * 100)) if pd.notnull(x) else None)
+    output_df['相关信息'] = df['涨跌幅'].apply(
+        lambda x: f"%+.2f" % (x * 100) + "%" if pd.notnull(x) else 'NaN'
+    )
+    concept_df = pd.DataFrame(list(first_concepts.items()), columns=['股票代码', '板块名称'])
+    output_df = pd.merge(output_df, concept_df, on='股票代码', how='left')
+    output_df = output_df.sort_values('时间', kind='stable')
+    html_df = output_df[['板块名称', '时间', '名称', '相关信息', '类型', '四舍五入取整']].copy()
+    html_df['上下午'] = html_df['时间'].apply(lambda tm: '上午' if int(tm[:2]) < 12 else '下午')
+    html_df['时间排序'] = html_df['时间'].apply(lambda tm: int(tm[:2]) * 60 + int(tm[3:5]))
+    html_df = html_df.sort_values(['上下午', '板块名称', '时间排序'])
+    html_df = html_df.drop_duplicates(subset=['名称', '类型'], keep='last')
+    return html_df
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    df, first_concepts = synthetic_day(args.events)
+    legacy = legacy_format_changes(df, first_concepts)
+    current = format_changes(df, first_concepts)
+    # 两种实现输出的行集合必须一致
+    to_rows = lambda frame: sorted(map(tuple, frame.astype(object).where(pd.notnull(frame), None).values.tolist()), key=repr)
+    assert to_rows(legacy) == to_rows(current.drop(columns=['股票代码'])), "format_changes 输出与旧实现不一致"
+
+    legacy_s = best_of(lambda: legacy_format_changes(df, first_concepts), args.repeat)
+    current_s = best_of(lambda: format_changes(df, first_concepts), args.repeat)
+    print(f"events={args.events} rows_out={len(current)}")
+    print(f"legacy apply   : {legacy_s * 1000:8.2f} ms")
+    print(f"vectorized     : {current_s * 1000:8.2f} ms")
+    print(f"speedup        : {legacy_s / current_s:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""多日历史存储的基准：从事件日志整理分区的耗时，以及按板块/类型跨月聚合的查询延迟
+
+    python -m benchmarks.history [--days 120] [--events 8000] [--format arrow]
+
+合成 --days 个交易日的事件日志（每天 --events 条去重后的事件和 200 名的上涨板块排名），
+backfill 到临时目录后分别测量首次查询（读分区）和再次查询（分区已缓存）的耗时，目标为 1 秒以内。
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as clock
+
+import history
+import storage
+from event_log import EventLog
+from fluctuation import TYPE_MAPPING
+from scheduler import TradingCalendar
+
+TYPES = sorted(set(TYPE_MAPPING.values()))
+
+
+def synthetic_day(rng, events, concepts=400, stocks=5000):
+    rows = []
+    for _ in range(events):
+        minute = rng.randrange(9 * 60 + 25, 15 * 60)
+        pct = rng.uniform(-20, 20)
+        rows.append({
+            '板块名称': f"板块{rng.randrange(concepts)}", '时间': f"{minute // 60:02d}:{minute % 60:02d}",
+            '名称': f"股票{rng.randrange(stocks)}", '相关信息': f"{pct:+.2f}%", '类型': rng.choice(TYPES),
+            '四舍五入取整': round(pct), '上下午': "上午" if minute < 720 else "下午", '时间排序': minute,
+            '股票代码': f"{rng.randrange(stocks):06d}",
+        })
+    ranking = [{'板块代码': f"BK{i:04d}", '板块名称': f"板块{i}"} for i in rng.sample(range(concepts), 200)]
+    return rows, ranking
+
+
+def write_logs(events_dir, calendar, days, events, seed=0):
+    rng = random.Random(seed)
+    end = date.today() - timedelta(days=1)
+    trading = calendar.trading_days(end - timedelta(days=days * 2), end)[-days:]
+    log = EventLog(events_dir, fsync_every=10 ** 9, fsync_interval=10 ** 9)
+    for day in trading:
+        rows, ranking = synthetic_day(rng, events)
+        stamp = datetime.combine(day, clock(15))
+        log.append(rows, now=stamp)
+        log.record_rising(ranking, now=stamp)
+    log.close()
+    return trading
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--events', type=int, default=8000, help='deduplicated events per day')
+    parser.add_argument('--format', choices=tuple(storage.STORES), default=None)
+    args = parser.parse_args()
+    if args.format:
+        os.environ['SIDECAR_STORAGE'] = args.format
+
+    calendar = TradingCalendar()
+    with tempfile.TemporaryDirectory() as tmp:
+        events_dir = os.path.join(tmp, 'events')
+        history_dir = os.path.join(tmp, 'history')
+        trading = write_logs(events_dir, calendar, args.days, args.events)
+        start, end = trading[0].strftime('%Y%m%d'), trading[-1].strftime('%Y%m%d')
+        backfill_s, result = timed(lambda: history.backfill(history_dir, events_dir, calendar, trading[0], trading[-1]))
+        size = sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(history_dir) for name in files)
+        print(f"format={storage.get_store().suffix[1:]} days={len(trading)} events/day={args.events} "
+              f"({len(trading) * args.events} rows, {size / 1e6:.1f} MB)")
+        print(f"  backfill {len(result['written'])} days: {backfill_s * 1000:10.1f} ms")
+
+        store = history.HistoryStore(history_dir)
+        queries = {
+            'concepts': lambda: store.concept_stats(start, end),
+            'types': lambda: store.type_stats(start, end),
+            'rising': lambda: store.rising_stats(start, end),
+        }
+        for name, query in queries.items():
+            cold_s, rows = timed(query)
+            warm_s, _ = timed(query)
+            print(f"  {name:9s} cold {cold_s * 1000:8.1f} ms  warm {warm_s * 1000:8.1f} ms  groups={len(rows)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+"""changes 两种采集方式的对比基准：worker 进程（process）与 API 进程内的 asyncio 任务（async）
+
+    python -m benchmarks.ingest [--modes process async] [--duration 30] [--rate 20] [--latency 0.02]
+                                [--output result.json]
+
+每种模式启动一个独立的 sidecar 子进程（SIDECAR_INGEST=<mode>，SIDECAR_ALWAYS_OPEN=1），
+对着同一个本地 eastmoney 替身服务器轮询，数据写入临时目录。
+first_frame：子进程启动到 /ws/changes 收到第一个采集结果的耗时（含导入与板块索引构建）。
+poll_to_frame：替身服务器收到一轮的首页请求到客户端收到该轮帧的延迟，即拉取→转换→编码→发布→推送。
+memory：sidecar 进程树（API 进程及其 worker 子进程）的 RSS，每秒采样，用 ps 读取。
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from websockets.sync.client import connect
+
+from benchmarks.fake_eastmoney import FakeEastmoney, synthetic_boards
+from benchmarks.pipeline import summarize
+from storage import write_table
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class RecordingEastmoney(FakeEastmoney):
+    """记录每一轮首页请求的时间"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.polls = []
+
+    def changes_body(self, query):
+        if query.get('pageindex', ['0'])[0] == '0':
+            self.polls.append(time.perf_counter())
+        return super().changes_body(query)
+
+
+def process_tree_rss(pid):
+    """返回 {pid: RSS 字节}，包含 pid 及其全部子孙进程"""
+    output = subprocess.run(['ps', '-A', '-o', 'pid=,ppid=,rss='], capture_output=True, text=True).stdout
+    children, rss = {}, {}
+    for line in output.splitlines():
+        child, parent, kb = (int(v) for v in line.split())
+        children.setdefault(parent, []).append(child)
+        rss[child] = kb * 1024
+    tree, stack = {}, [pid]
+    while stack:
+        current = stack.pop()
+        if current in rss:
+            tree[current] = rss[current]
+            stack.extend(children.get(current, []))
+    return tree
+
+
+def start_sidecar(mode, static_dir, port, fake):
+    env = {
+        **os.environ,
+        'SIDECAR_INGEST': mode,
+        'SIDECAR_ALWAYS_OPEN': '1',
+        'EASTMONEY_CHANGES_URL': fake.changes_url,
+        'EASTMONEY_CLIST_URL': fake.clist_url,
+    }
+    code = (
+        'import main\n'
+        f'main.start_changes_ingestion(static_dir={static_dir!r})\n'
+        'main.supervisor.start()\n'
+        'try:\n'
+        f'    main.start_api_server(port={port})\n'
+        'finally:\n'
+        '    main.supervisor.stop()\n'
+    )
+    return subprocess.Popen([sys.executable, '-c', code], cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def connect_changes(port, timeout=30.0):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            return connect(f'ws://127.0.0.1:{port}/ws/changes', open_timeout=1, max_size=None)
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise TimeoutError(f'sidecar did not listen on {port} within {timeout}s')
+            time.sleep(0.05)
+
+
+def bench_mode(mode, boards, concept_df, args):
+    fake = RecordingEastmoney(boards, rate=args.rate, initial=args.initial, latency=args.latency,
+                              order=args.order).start()
+    with tempfile.TemporaryDirectory() as static_dir:
+        write_table(os.path.join(static_dir, 'concepts'), concept_df)
+        started = time.perf_counter()
+        proc = start_sidecar(mode, static_dir, args.api_port, fake)
+        samples = []
+        stop = threading.Event()
+
+        def sample_memory():
+            while not stop.wait(1.0):
+                samples.append(process_tree_rss(proc.pid))
+
+        sampler = threading.Thread(target=sample_memory, daemon=True)
+        sampler.start()
+        try:
+            ws = connect_changes(args.api_port)
+            first_frame = None
+            latencies = []
+            frames = 0
+            deadline = None
+            with ws:
+                while deadline is None or time.perf_counter() < deadline:
+                    try:
+                        ws.recv(timeout=1)
+                    except TimeoutError:
+                        if first_frame is None and time.perf_counter() - started > args.timeout:
+                            raise
+                        continue
+                    arrived = time.perf_counter()
+                    polls = [t for t in fake.polls if t <= arrived]
+                    # 连接时补发的磁盘快照不算采集结果
+                    if not polls:
+                        continue
+                    if first_frame is None:
+                        first_frame = arrived - started
+                        deadline = arrived + args.duration
+                        continue
+                    frames += 1
+                    latencies.append(arrived - polls[-1])
+            status = requests.get(f'http://127.0.0.1:{args.api_port}/api/watch/status', timeout=5).json()
+        finally:
+            stop.set()
+            sampler.join()
+            tree = process_tree_rss(proc.pid)
+            proc.terminate()
+            try:
+                proc.wait(10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            # worker 为 daemon 进程，API 进程被终止时不一定来得及回收
+            for pid in tree:
+                if pid != proc.pid:
+                    try:
+                        os.kill(pid, 9)
+                    except OSError:
+                        pass
+            fake.stop()
+
+    totals = [sum(sample.values()) for sample in samples] or [0]
+    worker = status['workers'].get('getChanges', {})
+    return {
+        'first_frame_s': round(first_frame, 3),
+        'frames': frames,
+        'frames_per_s': round(frames / args.duration, 2),
+        'poll_to_frame': summarize(latencies),
+        'cycle_latency_s': worker.get('cycle_latency'),
+        'errors': worker.get('errors'),
+        'http': worker.get('http'),
+        'memory': {
+            'processes': max(len(sample) for sample in samples) if samples else 0,
+            'peak_rss_mb': round(max(totals) / 2 ** 20, 1),
+            'final_rss_mb': round(totals[-1] / 2 ** 20, 1),
+        },
+        'upstream_requests': fake.requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', choices=('process', 'async'), default=['process', 'async'])
+    parser.add_argument('--concepts', type=int, default=100000, help='rows of the synthetic concepts table')
+    parser.add_argument('--rate', type=float, default=20.0, help='events per second from the fake server')
+    parser.add_argument('--initial', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.02, help='fake server response latency (s)')
+    parser.add_argument('--order', choices=('asc', 'desc'), default='desc')
+    parser.add_argument('--duration', type=float, default=30.0, help='measured run per mode after the first frame (s)')
+    parser.add_argument('--timeout', type=float, default=60.0, help='max wait for the first frame (s)')
+    parser.add_argument('--api-port', type=int, default=61997)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    boards, concept_df = synthetic_boards(args.concepts)
+    results = {mode: bench_mode(mode, boards, concept_df, args) for mode in args.modes}
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'params': {k: v for k, v in vars(args).items() if k != 'output'},
+        },
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""离线的热路径基准：对本地 eastmoney 替身服务器测量整个管道，输出可比较的 JSON
+
+    python -m benchmarks.pipeline [--rate 20] [--initial 5000] [--latency 0.02] [--cycles 30]
+                                  [--duration 10] [--requests 200] [--clients 50] [--rounds 20]
+                                  [--output result.json] [--baseline previous.json]
+
+cycle：getChanges 单轮耗时（第一轮为全量拉取，之后为增量）。
+worker：与 worker 相同的 getChanges → 编码 → 共享内存发布循环，不 sleep，统计吞吐。
+http：/api/changes/json 的请求延迟，以及带 If-None-Match 的 304 延迟。
+ws：worker 快照进入 buffer_queue 到 N 个 /ws/changes 客户端收到帧的扇出延迟。
+
+不写入 static 目录。指定 --baseline 时逐项打印与上一次结果的差异。
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import threading
+import time
+
+import requests
+from websockets.asyncio.client import connect
+
+import fastjson
+import fluctuation
+import main as api
+from benchmarks.fake_eastmoney import FakeEastmoney, synthetic_boards
+from concept_index import ConceptIndex
+from get_changes_worker_queue import encode_snapshot
+from shm_transport import SnapshotRing
+
+
+def summarize(samples):
+    """毫秒统计"""
+    ms = sorted(s * 1000 for s in samples)
+    if not ms:
+        return {}
+    return {
+        'n': len(ms),
+        'mean_ms': round(statistics.fmean(ms), 3),
+        'p50_ms': round(ms[len(ms) // 2], 3),
+        'p95_ms': round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        'max_ms': round(ms[-1], 3),
+    }
+
+
+def bench_cycle(concept_index, cycles):
+    fluctuation._changes_fetcher = fluctuation.ChangesFetcher()
+    timings = []
+    unchanged = 0
+    last = None
+    for _ in range(cycles):
+        start = time.perf_counter()
+        df = fluctuation.getChanges(concept_index)
+        timings.append(time.perf_counter() - start)
+        unchanged += df is last
+        last = df
+    return {'cold_ms': round(timings[0] * 1000, 3), 'steady': summarize(timings[1:]), 'unchanged_cycles': unchanged,
+            'rows': 0 if last is None else len(last)}
+
+
+def bench_worker(concept_index, duration):
+    ring = SnapshotRing.create()
+    try:
+        cycles = published = 0
+        encode = []
+        last = None
+        payload = None
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            df = fluctuation.getChanges(concept_index)
+            cycles += 1
+            if df is not last:
+                start = time.perf_counter()
+                _, payload = encode_snapshot(df)
+                encode.append(time.perf_counter() - start)
+                ring.publish(payload)
+                published += 1
+                last = df
+        return {
+            'cycles_per_s': round(cycles / duration, 2),
+            'snapshots_per_s': round(published / duration, 2),
+            'encode': summarize(encode),
+            'payload_bytes': len(payload or b''),
+        }, payload
+    finally:
+        ring.close()
+
+
+def publish_and_wait(payload, timeout=5.0):
+    """经 buffer_queue 发布一个快照，等 API 进程处理完"""
+    seq = api.changes_hub.seq
+    api.buffer_queue.put(('bytes', payload))
+    deadline = time.perf_counter() + timeout
+    while api.changes_hub.seq == seq:
+        if time.perf_counter() > deadline:
+            raise TimeoutError('snapshot was not published')
+        time.sleep(0.001)
+
+
+def bench_http(base_url, payload, count):
+    publish_and_wait(payload)
+    session = requests.Session()
+    url = f'{base_url}/api/changes/json'
+    etag = session.get(url).headers['ETag']
+    full, not_modified = [], []
+    for _ in range(count):
+        start = time.perf_counter()
+        session.get(url).content
+        full.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        response = session.get(url, headers={'If-None-Match': etag})
+        not_modified.append(time.perf_counter() - start)
+        assert response.status_code == 304
+    return {'full': summarize(full), 'not_modified': summarize(not_modified), 'bytes': len(payload)}
+
+
+async def _fanout(ws_url, payloads, clients, rounds):
+    sockets = [await connect(ws_url, max_size=None) for _ in range(clients)]
+    try:
+        # 先收掉连接时补发的快照
+        await asyncio.gather(*(ws.recv() for ws in sockets))
+        latencies = []
+        for i in range(rounds):
+            start = time.perf_counter()
+            await asyncio.to_thread(api.buffer_queue.put, ('bytes', payloads[i % len(payloads)]))
+
+            async def receive(ws):
+                await ws.recv()
+                return time.perf_counter() - start
+
+            latencies.extend(await asyncio.gather(*(receive(ws) for ws in sockets)))
+        return latencies
+    finally:
+        await asyncio.gather(*(ws.close() for ws in sockets))
+
+
+def bench_ws(base_url, payload, clients, rounds):
+    rows = fastjson.loads(payload)
+    # 轮流发布两个不同的快照，每轮都会产生新帧
+    payloads = [payload, fastjson.dumps(rows[:-1])]
+    ws_url = base_url.replace('http://', 'ws://') + '/ws/changes'
+    latencies = asyncio.run(_fanout(ws_url, payloads, clients, rounds))
+    return {'clients': clients, 'rounds': rounds, 'latency': summarize(latencies)}
+
+
+def start_api(port):
+    server = api.Server(api.Config(api.app, host='127.0.0.1', port=port, log_level='warning'))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread
+
+
+def compare(baseline, current, prefix=''):
+    for key, value in current.items():
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            compare(old or {}, value, name + '.')
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+            print(f'{name:<40} {old:>12} {value:>12} {(value - old) / old * 100:>+8.1f}%')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concepts', type=int, default=100000, help='rows of the synthetic concepts table')
+    parser.add_argument('--rate', type=float, default=20.0, help='events per second from the fake server')
+    parser.add_argument('--initial', type=int, default=5000)
+    parser.add_argument('--latency', type=float, default=0.02, help='fake server response latency (s)')
+    parser.add_argument('--order', choices=('asc', 'desc'), default='desc')
+    parser.add_argument('--cycles', type=int, default=30)
+    parser.add_argument('--duration', type=float, default=10.0, help='worker throughput run (s)')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--api-port', type=int, default=61998)
+    parser.add_argument('--output')
+    parser.add_argument('--baseline')
+    args = parser.parse_args()
+
+    boards, concept_df = synthetic_boards(args.concepts)
+    concept_index = ConceptIndex.from_frame(concept_df)
+    fake = FakeEastmoney(boards, rate=args.rate, initial=args.initial, latency=args.latency, order=args.order).start()
+    # getChanges 在调用时读取模块级的地址，直接指向替身服务器
+    fluctuation.CHANGES_URL = fake.changes_url
+    fluctuation.CLIST_URL = fake.clist_url
+    server, thread = start_api(args.api_port)
+    base_url = f'http://127.0.0.1:{args.api_port}'
+    try:
+        results = {'cycle': bench_cycle(concept_index, args.cycles)}
+        results['worker'], payload = bench_worker(concept_index, args.duration)
+        results['http'] = bench_http(base_url, payload, args.requests)
+        results['ws'] = bench_ws(base_url, payload, args.clients, args.rounds)
+    finally:
+        server.should_exit = True
+        thread.join(5)
+        fake.stop()
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'encoder': 'orjson' if fastjson.orjson is not None else 'stdlib',
+            'params': {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')},
+            'upstream_requests': fake.requests,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\n{'metric':<40} {'baseline':>12} {'current':>12} {'change':>9}")
+        compare(baseline.get('results', {}), results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""sidecar 冷启动基准：main 的导入耗时与首个 /ws/changes 帧的到达时间
+
+    python -m benchmarks.startup [--top 15] [--port 61999] [--runs 3]
+
+importtime：用 python -X importtime 导入 main，列出累计耗时最多的模块，
+检查 pandas/akshare 等重依赖没有被 API 进程加载。
+first frame：启动只运行 API 服务（不启动 worker）的子进程，从启动到收到
+/ws/changes 第一帧（磁盘上缓存的快照）的耗时，目标为 1 秒以内。
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from websockets.sync.client import connect
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('pandas', 'numpy', 'pyarrow', 'akshare', 'requests')
+
+
+def import_times():
+    """返回 [(模块名, 自身微秒, 累计微秒)]"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def first_frame_seconds(port, timeout=30.0):
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, '-c', f'import main; main.start_api_server(port={port})'],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with connect(f'ws://127.0.0.1:{port}/ws/changes', open_timeout=1, max_size=None) as ws:
+                    ws.recv()
+                    return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f'no /ws/changes frame within {timeout}s')
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--port', type=int, default=61999)
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    modules = import_times()
+    total = next((cumulative for name, _, cumulative in modules if name == 'main'), 0)
+    print(f"import main: {total / 1000:.1f} ms")
+    print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+    top_level = [m for m in modules if '.' not in m[0]]
+    for name, self_us, cumulative_us in sorted(top_level, key=lambda m: m[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {name}")
+    loaded = sorted({m[0] for m in modules} & set(HEAVY_MODULES))
+    print(f"heavy modules imported by main: {', '.join(loaded) or 'none'}")
+
+    timings = [first_frame_seconds(args.port) for _ in range(args.runs)]
+    print("first /ws/changes frame: " + ", ".join(f"{s * 1000:.0f} ms" for s in timings)
+          + f" (best {min(timings) * 1000:.0f} ms)")
+
+
+if __name__ == '__main__':
+    main()
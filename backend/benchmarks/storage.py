@@ -0,0 +1,81 @@
+"""concepts/changes 存储格式的基准：启动加载耗时与写放大
+
+    python -m benchmarks.storage [--concepts 100000] [--changes 5000] [--flush-snapshots 100]
+
+旧流程：每次批量写入把缓冲的全部快照 concat 后整体写 CSV，启动时 read_csv 解析 concepts.csv。
+新流程：只原子写入最新快照，启动时内存映射读取 Arrow IPC 文件。
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import pandas as pd
+
+import storage
+
+
+def synthetic_concepts(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = random.Random(seed)
+    boards = [(f"BK{i:04d}", f"板块{i}") for i in range(max(1, rows // 250))]
+    data = []
+    for _ in range(rows):
+        code, name = rng.choice(boards)
+        stock = f"{rng.randrange(0, 700000):06d}"
+        data.append([code, name, stock, f"股票{stock}"])
+    return pd.DataFrame(data, columns=['板块代码', '板块名称', '股票代码', '股票名称'])
+
+
+def synthetic_changes(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = random.Random(seed)
+    data = []
+    for _ in range(rows):
+        minute = rng.randrange(9 * 60 + 25, 15 * 60)
+        pct = rng.uniform(-20, 20)
+        data.append([f"板块{rng.randrange(400)}", f"{minute // 60:02d}:{minute % 60:02d}", f"股票{rng.randrange(5000)}",
+                     f"{pct:+.2f}%", "火箭发射", round(pct), "上午" if minute < 720 else "下午", minute])
+    return pd.DataFrame(data, columns=['板块名称', '时间', '名称', '相关信息', '类型', '四舍五入取整', '上下午', '时间排序'])
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concepts', type=int, default=100000)
+    parser.add_argument('--changes', type=int, default=5000)
+    parser.add_argument('--flush-snapshots', type=int, default=100)
+    args = parser.parse_args()
+
+    concepts = synthetic_concepts(args.concepts)
+    changes = synthetic_changes(args.changes)
+    with tempfile.TemporaryDirectory() as tmp:
+        base = os.path.join(tmp, 'concepts')
+        print(f"concepts rows={len(concepts)}")
+        for kind in storage.STORES:
+            path = storage.write_table(base, concepts, kind=kind)
+            store = storage.STORES[kind]
+            load_s = timed(lambda: store.read_frame(path))
+            print(f"  {kind:6s} startup load: {load_s * 1000:8.2f} ms  size: {os.path.getsize(path) / 1e6:6.2f} MB")
+
+        # 一次批量写入的字节数：旧实现写缓冲区内全部快照，新实现只写最新快照
+        legacy_path = os.path.join(tmp, 'legacy_changes.csv')
+        legacy_s = timed(lambda: pd.concat([changes] * args.flush_snapshots, ignore_index=True).to_csv(legacy_path, index=False), repeat=1)
+        print(f"changes rows={len(changes)} snapshots per flush={args.flush_snapshots}")
+        print(f"  legacy concat+csv  : {legacy_s * 1000:8.2f} ms  bytes: {os.path.getsize(legacy_path) / 1e6:8.2f} MB")
+        for kind in storage.STORES:
+            base = os.path.join(tmp, f'changes_{kind}')
+            write_s = timed(lambda: storage.write_table(base, changes, kind=kind), repeat=3)
+            path, _ = storage.find_table(base)
+            print(f"  {kind:6s} latest only: {write_s * 1000:8.2f} ms  bytes: {os.path.getsize(path) / 1e6:8.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+import asyncio
+import hashlib
+
+import fastjson
+
+
+def row_key(row):
+    """变更行的唯一键：名称+类型"""
+    return (row.get('名称'), row.get('类型'))
+
+
+def shape_rows(rows, fmt):
+    """columns 格式把行列表转为列名+二维数组，省去每行重复的键名"""
+    if fmt == "columns":
+        columns = list(rows[0]) if rows else []
+        return {"columns": columns, "data": [[row.get(c) for c in columns] for row in rows]}
+    return rows
+
+
+SESSIONS = ("上午", "下午")
+
+
+def _string_set(value, field):
+    # 单个字符串或字符串列表，空值表示不限制
+    if value is None or value == "" or value == []:
+        return None
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError(f"'{field}' must be a string or a list of strings")
+    return frozenset(value)
+
+
+class ChangeFilter:
+    """/ws/changes 的订阅条件：板块名称、类型、最小 |四舍五入取整|、上下午
+
+    可哈希，条件相同的订阅共用同一个过滤结果和编码后的帧。
+    """
+
+    __slots__ = ("concepts", "types", "min_change", "sessions", "_key")
+
+    def __init__(self, concepts=None, types=None, min_change=0, sessions=None):
+        self.concepts = concepts
+        self.types = types
+        self.min_change = min_change
+        self.sessions = sessions
+        self._key = (concepts, types, min_change, sessions)
+
+    @classmethod
+    def from_message(cls, message, resolve_concept=None):
+        """从订阅消息构建过滤条件，没有任何条件时返回 None。
+
+        concepts 可以是板块代码或板块名称，resolve_concept 把板块代码转换为名称。
+        """
+        concepts = _string_set(message.get("concepts"), "concepts")
+        if concepts is not None and resolve_concept is not None:
+            concepts = frozenset(resolve_concept(c) or c for c in concepts)
+        types = _string_set(message.get("types"), "types")
+        sessions = _string_set(message.get("session"), "session")
+        if sessions is not None and not sessions <= set(SESSIONS):
+            raise ValueError(f"'session' must be one of {SESSIONS}")
+        min_change = message.get("min_change") or 0
+        if isinstance(min_change, bool) or not isinstance(min_change, (int, float)) or min_change < 0:
+            raise ValueError("'min_change' must be a non-negative number")
+        flt = cls(concepts, types, min_change, sessions)
+        return None if flt.matches_all() else flt
+
+    def matches_all(self):
+        return self.concepts is None and self.types is None and not self.min_change and self.sessions is None
+
+    def matches(self, row):
+        if self.concepts is not None and row.get("板块名称") not in self.concepts:
+            return False
+        if self.types is not None and row.get("类型") not in self.types:
+            return False
+        if self.sessions is not None and row.get("上下午") not in self.sessions:
+            return False
+        if self.min_change:
+            value = row.get("四舍五入取整")
+            if not isinstance(value, (int, float)) or abs(value) < self.min_change:
+                return False
+        return True
+
+    def __eq__(self, other):
+        return isinstance(other, ChangeFilter) and self._key == other._key
+
+    def __hash__(self):
+        return hash(self._key)
+
+
+class Snapshot:
+    """一次发布的快照及其相对上一次快照的增量，各种帧按需编码且只编码一次"""
+
+    def __init__(self, seq, rows, added, removed, payload=None):
+        self.seq = seq
+        self.rows = rows
+        self.added = added
+        self.removed = removed
+        self._full_bytes = payload  # worker 已编码好的整张列表，直接复用
+        self._etag = None
+        self._frames = {}
+        self._views = {}  # ChangeFilter → (rows, added, removed)
+
+    @property
+    def full_bytes(self):
+        # 兼容旧客户端：整张列表
+        if self._full_bytes is None:
+            self._full_bytes = fastjson.dumps(self.rows)
+        return self._full_bytes
+
+    @property
+    def etag(self):
+        # 按内容计算，服务重启后 seq 归零也不会误判
+        if self._etag is None:
+            digest = hashlib.blake2b(self.full_bytes, digest_size=8).hexdigest()
+            self._etag = f'"{digest}"'
+        return self._etag
+
+    def body(self, fmt="json"):
+        """HTTP 响应体：整张列表按 fmt 编码后的字节"""
+        if fmt == "json":
+            return self.full_bytes
+        data, binary = self.frame("full", fmt)
+        return data if binary else data.encode("utf-8")
+
+    def view(self, flt=None):
+        """按订阅条件过滤后的 (rows, added, removed)，每个不同的条件只计算一次"""
+        if flt is None:
+            return self.rows, self.added, self.removed
+        view = self._views.get(flt)
+        if view is None:
+            rows = [row for row in self.rows if flt.matches(row)]
+            added = []
+            # 内容变化后不再满足条件的行，对该订阅来说等同于被删除
+            removed = list(self.removed)
+            for row in self.added:
+                if flt.matches(row):
+                    added.append(row)
+                else:
+                    removed.append(list(row_key(row)))
+            view = self._views[flt] = (rows, added, removed)
+        return view
+
+    def frame(self, kind, fmt="json", flt=None):
+        """返回 (数据, 是否二进制帧)。kind 为 full/snapshot/delta，订阅条件相同的客户端共用同一份编码结果"""
+        key = (kind, fmt, flt)
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = self._frames[key] = self._encode(kind, fmt, flt)
+        return frame
+
+    def _encode(self, kind, fmt, flt):
+        rows, added, removed = self.view(flt)
+        if kind == "full":
+            if fmt == "json" and flt is None:
+                return self.full_bytes.decode("utf-8"), False
+            obj = shape_rows(rows, fmt)
+        elif kind == "snapshot":
+            obj = {"type": "snapshot", "seq": self.seq, "rows": shape_rows(rows, fmt)}
+        else:
+            obj = {
+                "type": "delta",
+                "seq": self.seq,
+                "prev": self.seq - 1,
+                "added": shape_rows(added, fmt),
+                "removed": removed,
+            }
+        if fmt == "msgpack":
+            return fastjson.packb(obj), True
+        return fastjson.dumps(obj).decode("utf-8"), False
+
+
+class Subscriber:
+    """单个 /ws/changes 客户端的有界发送队列
+
+    mode="full" 每次发送整张列表；mode="delta" 连接时发送 snapshot，
+    之后只发送 delta，丢帧或客户端请求时重新发送 snapshot。
+    fmt 为 json/columns/msgpack，msgpack 以二进制帧发送。
+    filter 为 ChangeFilter 时只发送满足条件的行。
+    """
+
+    def __init__(self, maxsize=2, mode="full", fmt="json"):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.mode = mode
+        self.fmt = fmt
+        self.filter = None
+        self.needs_snapshot = True
+        self.dropped = 0
+
+    def offer(self, snapshot):
+        # 队列已满说明客户端跟不上，丢弃最旧的快照只保留最新的，不阻塞其他客户端
+        while self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+                # 增量链断了，下一帧必须是完整快照
+                self.needs_snapshot = True
+            except asyncio.QueueEmpty:
+                break
+        self.queue.put_nowait(snapshot)
+
+    def request_resync(self, snapshot):
+        self.needs_snapshot = True
+        if snapshot is not None:
+            # 排队中的旧快照都早于 snapshot，先清空，否则完整快照之后会收到 prev 对不上的旧帧
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.offer(snapshot)
+
+    def set_filter(self, flt, snapshot):
+        """更换订阅条件后立即按新条件重新发送完整快照"""
+        self.filter = flt
+        self.request_resync(snapshot)
+
+    def render(self, snapshot):
+        """返回 (数据, 是否二进制帧)"""
+        if self.mode != "delta":
+            return snapshot.frame("full", self.fmt, self.filter)
+        if self.needs_snapshot:
+            self.needs_snapshot = False
+            return snapshot.frame("snapshot", self.fmt, self.filter)
+        return snapshot.frame("delta", self.fmt, self.filter)
+
+
+class ChangesHub:
+    """把 buffer_queue 中的快照扇出给所有订阅的 WebSocket 客户端"""
+
+    def __init__(self, maxsize=2):
+        self.maxsize = maxsize
+        self.subscribers = set()
+        self.seq = 0
+        self.latest = None  # 最近一次发布的 Snapshot，新连接直接补发
+        self.dropped = 0  # 已断开客户端累计丢弃的帧数
+        self._rows_by_key = {}
+
+    def subscribe(self, mode="full", fmt="json"):
+        sub = Subscriber(self.maxsize, mode, fmt)
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        if sub in self.subscribers:
+            self.subscribers.discard(sub)
+            self.dropped += sub.dropped
+
+    def dropped_total(self):
+        """所有客户端（含已断开的）累计丢弃的帧数"""
+        return self.dropped + sum(sub.dropped for sub in self.subscribers)
+
+    def empty_snapshot(self):
+        """还没有任何数据时发给新连接的空列表，不广播也不改变 latest 和 seq，
+        之后的第一次发布相对空列表计算增量，与这个快照衔接"""
+        return Snapshot(self.seq, [], [], [])
+
+    def publish(self, rows, payload=None):
+        rows_by_key = {row_key(row): row for row in rows}
+        previous = self._rows_by_key
+        # 新增或内容变化的行都算 added，消失的键算 removed
+        added = [row for key, row in rows_by_key.items() if previous.get(key) != row]
+        removed = [list(key) for key in previous if key not in rows_by_key]
+        self._rows_by_key = rows_by_key
+        self.seq += 1
+        snapshot = Snapshot(self.seq, rows, added, removed, payload)
+        self.latest = snapshot
+        for sub in self.subscribers:
+            sub.offer(snapshot)
+        return snapshot
@@ -0,0 +1,97 @@
+import asyncio
+
+import fastjson
+
+# 可用于排序的字段
+HEAT_FIELDS = ("heat", "magnitude", "events", "up", "down", "limit_up", "stocks")
+
+
+class ConceptHeat:
+    """按板块名称累计当日异动热度，只用新到达的事件增量更新
+
+    每个板块记录事件数、上涨/下跌事件数、封涨停板次数、涉及股票数、
+    |四舍五入取整| 之和（magnitude）以及带符号的和（heat）。
+    输出大小与板块数成正比，排序结果和编码后的帧按版本缓存。
+    """
+
+    def __init__(self, day: str = None, limit_type: str = "封涨停板"):
+        self.limit_type = limit_type
+        self.clients = set()
+        self.dropped = 0  # 客户端还没取走就被替换掉的帧数
+        self._reset(day)
+
+    def _reset(self, day):
+        self.day = day
+        self.version = 0
+        self.stats = {}
+        self._stocks = {}
+        self._frame = None
+
+    def add(self, rows, day: str) -> bool:
+        """加入新事件（应已去重，如 EventIndex.add 的返回值），跨日时先清空；有变化时返回 True"""
+        if day != self.day:
+            self._reset(day)
+        changed = False
+        for row in rows:
+            name = row.get("板块名称")
+            if not name:
+                continue
+            stat = self.stats.get(name)
+            if stat is None:
+                stat = self.stats[name] = {"name": name, **dict.fromkeys(HEAT_FIELDS, 0)}
+                self._stocks[name] = set()
+            value = row.get("四舍五入取整")
+            value = value if isinstance(value, (int, float)) else 0
+            stat["events"] += 1
+            if value > 0:
+                stat["up"] += 1
+            elif value < 0:
+                stat["down"] += 1
+            if row.get("类型") == self.limit_type:
+                stat["limit_up"] += 1
+            stat["magnitude"] += abs(value)
+            stat["heat"] += value
+            stocks = self._stocks[name]
+            stocks.add(row.get("股票代码") or row.get("名称"))
+            stat["stocks"] = len(stocks)
+            changed = True
+        if changed:
+            self.version += 1
+            self._frame = None
+        return changed
+
+    def ranked(self, sort: str = "heat", limit: int = None) -> list:
+        """按 sort 字段降序排列的板块热度，同分时按事件数"""
+        if sort not in HEAT_FIELDS:
+            raise ValueError(f"sort must be one of {HEAT_FIELDS}")
+        stats = sorted(self.stats.values(), key=lambda s: (s[sort], s["events"]), reverse=True)
+        return stats if limit is None else stats[:limit]
+
+    def document(self, sort: str = "heat", limit: int = None) -> dict:
+        return {"day": self.day, "version": self.version, "concepts": self.ranked(sort, limit)}
+
+    def frame(self) -> bytes:
+        """默认排序的完整热度表，编码结果在下一次变化前复用"""
+        if self._frame is None:
+            self._frame = fastjson.dumps(self.document())
+        return self._frame
+
+    def subscribe(self):
+        # 只关心最新的热度表，队列长度为1
+        client = asyncio.Queue(maxsize=1)
+        self.clients.add(client)
+        return client
+
+    def unsubscribe(self, client):
+        self.clients.discard(client)
+
+    def broadcast(self):
+        """在事件循环线程调用，把最新一帧发给所有客户端，未取走的旧帧直接替换"""
+        if not self.clients:
+            return
+        frame = self.frame()
+        for client in self.clients:
+            if client.full():
+                client.get_nowait()
+                self.dropped += 1
+            client.put_nowait(frame)
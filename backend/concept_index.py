@@ -0,0 +1,74 @@
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def normalize_stock_code(code) -> str:
+    """统一为6位字符串代码，concepts.csv 经 read_csv 后会丢失前导0"""
+    return str(code).strip().zfill(6)
+
+
+class ConceptIndex:
+    """股票→板块的预计算索引，concepts.csv 加载后构建一次
+
+    每轮轮询只需对发生异动的股票查字典，按上涨板块排名取第一个板块，
+    开销与异动条数成正比，与板块表大小无关。
+    """
+
+    def __init__(self, concept_codes, concept_names, stock_concepts):
+        self.concept_codes = concept_codes  # 板块id → 板块代码
+        self.concept_names = concept_names  # 板块id → 板块名称
+        self.concept_ids = {code: i for i, code in enumerate(concept_codes)}
+        self.stock_concepts = stock_concepts  # 股票代码 → 板块id元组，保持 concepts.csv 中的顺序
+
+    @classmethod
+    def from_frame(cls, concept_df: "pd.DataFrame") -> "ConceptIndex":
+        import pandas as pd
+        required = {'板块代码', '板块名称', '股票代码'}
+        if concept_df is None or concept_df.empty or not required.issubset(concept_df.columns):
+            return cls([], [], {})
+        ids, codes = pd.factorize(concept_df['板块代码'].astype(str))
+        names = concept_df['板块名称'].groupby(ids).first()
+        stock_concepts = {}
+        for stock, cid in zip(concept_df['股票代码'].map(normalize_stock_code), ids.tolist()):
+            cids = stock_concepts.setdefault(stock, [])
+            if cid not in cids:
+                cids.append(cid)
+        return cls(
+            list(codes),
+            [names.get(i) for i in range(len(codes))],
+            {stock: tuple(cids) for stock, cids in stock_concepts.items()},
+        )
+
+    def __len__(self):
+        return len(self.concept_codes)
+
+    def rising_ranks(self, rising_codes) -> dict:
+        """板块id → 在上涨板块列表中的名次，重复出现时取第一次"""
+        ranks = {}
+        for rank, code in enumerate(rising_codes):
+            cid = self.concept_ids.get(code)
+            if cid is not None:
+                ranks.setdefault(cid, rank)
+        return ranks
+
+    def rising_ranking(self, rising_codes) -> list:
+        """上涨板块列表按名次转为 [{"板块代码", "板块名称"}]，不在板块表中的代码名称为 None"""
+        ranking = []
+        for code in rising_codes:
+            cid = self.concept_ids.get(code)
+            ranking.append({"板块代码": code, "板块名称": None if cid is None else self.concept_names[cid]})
+        return ranking
+
+    def first_concepts(self, stock_codes, rising_codes) -> dict:
+        """为每只股票选出上涨排名最靠前的所属板块名称；都不在上涨列表时取第一个所属板块"""
+        ranks = self.rising_ranks(rising_codes)
+        unranked = len(ranks) + len(self.concept_codes)
+        result = {}
+        for code in set(stock_codes):
+            cids = self.stock_concepts.get(normalize_stock_code(code))
+            if cids:
+                best = min(cids, key=lambda cid: ranks.get(cid, unranked))
+                result[code] = self.concept_names[best]
+        return result
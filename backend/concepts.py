@@ -1,32 +1,168 @@
+import json
+import os
+import sys
+import threading
 import time as t
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 import akshare as ak
-from typing import List, List
+from typing import List, Optional
+from storage import write_table
 
+CONCEPTS_PATH = 'static/concepts'
+AKSHARE_HOME = os.path.join(getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__))), 'akshare')
+CHECKPOINT_DIR = 'static/concepts_ckpt'
+# 板块列表接口没有稳定的成分股数量（上涨/下跌家数和总市值每天都变），检查点按抓取时间过期。
+# 每个板块的有效期按板块代码固定分布在 [TTL/2, TTL) 内，同一次全量抓取的检查点不会同时过期
+CHECKPOINT_TTL = 24 * 3600
 
-def getConcepts() -> None:
+
+class TokenBucket:
+    """令牌桶限速：平均每秒 rate 次请求，最多允许 burst 次突发"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = t.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = t.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            t.sleep(wait)
+
+
+def _checkpoint_path(board_code: str) -> str:
+    return os.path.join(CHECKPOINT_DIR, f"{board_code}.json")
+
+
+def _load_checkpoint(board_code: str) -> Optional[dict]:
+    try:
+        with open(_checkpoint_path(board_code), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_checkpoint(checkpoint: dict) -> None:
+    # 先写临时文件再原子替换，中断时不会留下半个文件
+    path = _checkpoint_path(checkpoint['板块代码'])
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def prepare_akshare_home() -> None:
+    """设置 akshare 的数据目录，并创建默认的 calendar.json（如果不存在）"""
+    os.environ['AKSHARE_HOME'] = AKSHARE_HOME
+    file_fold_path = os.path.join(AKSHARE_HOME, 'file_fold')
+    os.makedirs(file_fold_path, exist_ok=True)
+    calendar_path = os.path.join(file_fold_path, 'calendar.json')
+    if not os.path.exists(calendar_path):
+        with open(calendar_path, 'w', encoding='utf-8') as f:
+            json.dump({"calendar": []}, f)
+
+
+def _board_ttl(board_code: str, max_age: float) -> float:
+    """板块检查点的有效期：按板块代码的哈希固定分布在 [max_age/2, max_age)"""
+    return max_age * (0.5 + (zlib.crc32(board_code.encode('utf-8')) % 1000) / 2000)
+
+
+def _checkpoint_fresh(checkpoint: dict, board_name: str, max_age: float) -> bool:
+    """检查点在该板块的有效期内抓取且板块名称没变时直接复用"""
+    fetched_at = checkpoint.get('fetched_at')
+    if not isinstance(fetched_at, (int, float)) or checkpoint.get('板块名称') != board_name:
+        return False
+    return 0 <= t.time() - fetched_at < _board_ttl(checkpoint['板块代码'], max_age)
+
+
+def _fetch_board(board_code: str, board_name: str, bucket: TokenBucket) -> dict:
+    bucket.acquire()
+    stock_board_concept_spot_em_df = ak.stock_board_concept_cons_em(symbol=board_code)
+    checkpoint = {
+        '板块代码': board_code,
+        '板块名称': board_name,
+        'fetched_at': t.time(),
+        'stocks': stock_board_concept_spot_em_df[['代码', '名称']].astype(str).values.tolist(),
+    }
+    _save_checkpoint(checkpoint)
+    return checkpoint
+
+
+def getConcepts(max_workers: int = 4, rate: float = 2.0, burst: int = 4, incremental: bool = True,
+                max_age: float = CHECKPOINT_TTL) -> None:
     """
-    Fetch concept stock data and save to a CSV file.
-    
+    Fetch concept stock data and save it to the concepts table.
+
     This function retrieves stock concepts and their constituent stocks from akshare,
-    filters them by market cap, and saves the results to 'static/concepts.csv'.
+    filters them by market cap, and saves the results to 'static/concepts'
+    (Arrow IPC when pyarrow is installed, CSV otherwise).
+    Boards are fetched by a bounded worker pool behind a token-bucket rate limiter,
+    and each board is checkpointed under 'static/concepts_ckpt'. A checkpoint is reused
+    for a per-board TTL between max_age/2 and max_age seconds (derived from the board
+    code), so an interrupted run resumes where it stopped, and checkpoints from one full
+    crawl expire at different times: runs more frequent than max_age each refresh part
+    of the boards. A run never reuses a checkpoint older than max_age (one day by
+    default), so with one run per day every board is refreshed daily as before. The board list has no
+    stable constituent count, so changes within that window are not detected early;
+    use incremental=False to refetch everything.
     """
-    concepts: List[List[str]] = [['板块代码', '板块名称', '股票代码', '股票名称']]
+    prepare_akshare_home()
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
     stock_board_concept_name_em_df = ak.stock_board_concept_name_em()
     stock_board_concept_name_em_df.sort_values(by='总市值', ascending=True, inplace=True)
-    
+
+    boards = []
     for _, v in stock_board_concept_name_em_df.iterrows():
         if int(v['总市值']) > 30000000000000 or '昨日' in v['板块名称']:
             continue
-            
-        stock_board_concept_spot_em_df = ak.stock_board_concept_cons_em(symbol=v['板块代码'])
-        for _, v2 in stock_board_concept_spot_em_df.iterrows():
-            row = [v['板块代码'], v['板块名称'], v2['代码'], v2['名称']]
-            concepts.append(row)
-            
-        print(v['板块名称'], len(concepts))
-        if len(concepts) % 20 == 0:
-            t.sleep(15)
-            
+        boards.append((v['板块代码'], v['板块名称']))
+
+    results = {}
+    pending = []
+    for board_code, board_name in boards:
+        checkpoint = _load_checkpoint(board_code)
+        if checkpoint is not None:
+            results[board_code] = checkpoint
+            if incremental and _checkpoint_fresh(checkpoint, board_name, max_age):
+                continue
+        pending.append((board_code, board_name))
+    print(f"共 {len(boards)} 个板块，需抓取 {len(pending)} 个", flush=True)
+
+    bucket = TokenBucket(rate, burst)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_fetch_board, board_code, board_name, bucket): board_name
+            for board_code, board_name in pending
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            board_name = futures[future]
+            try:
+                checkpoint = future.result()
+                results[checkpoint['板块代码']] = checkpoint
+                print(board_name, len(checkpoint['stocks']), f"{done}/{len(pending)}", flush=True)
+            except Exception as e:
+                # 失败的板块沿用旧的检查点（如果有），下次运行会重试
+                print(f"{board_name} 抓取失败: {e}", flush=True)
+
+    # 按总市值升序输出，与逐个抓取时的顺序一致
+    concepts: List[List[str]] = []
+    for board_code, board_name in boards:
+        checkpoint = results.get(board_code)
+        if checkpoint is None:
+            continue
+        for stock_code, stock_name in checkpoint['stocks']:
+            concepts.append([board_code, board_name, stock_code, stock_name])
+
     df = pd.DataFrame(concepts, columns=['板块代码', '板块名称', '股票代码', '股票名称'])
-    df.to_csv('static/concepts.csv', index=False)
+    write_table(CONCEPTS_PATH, df)
@@ -0,0 +1,266 @@
+import bisect
+import json
+import os
+import time
+from datetime import datetime
+
+from scheduler import BEIJING
+
+MINUTES = 24 * 60
+
+
+def event_key(row):
+    """事件的去重键：股票代码+类型+时间（分钟）"""
+    return (row.get('股票代码'), row.get('类型'), row.get('时间'))
+
+
+def event_minute(row) -> int:
+    """事件发生的分钟数，优先使用 getChanges 输出的 时间排序 列"""
+    minute = row.get('时间排序')
+    if minute is not None:
+        return int(minute)
+    return parse_hhmm(row.get('时间') or '00:00')
+
+
+def parse_hhmm(value: str) -> int:
+    """HH:MM → 当天的分钟数，格式或取值（小时 0–23、分钟 0–59）不合法时抛出 ValueError"""
+    hour, minute = value.split(':')
+    hour, minute = int(hour), int(minute)
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        raise ValueError(f"invalid time {value!r}")
+    return hour * 60 + minute
+
+
+def trading_day(now: datetime = None) -> str:
+    """北京时间的日期 YYYYMMDD；不带时区的 now 视为北京时间"""
+    now = now or datetime.now(BEIJING)
+    if now.tzinfo is not None:
+        now = now.astimezone(BEIJING)
+    return now.strftime('%Y%m%d')
+
+
+def day_path(directory: str, day: str) -> str:
+    return os.path.join(directory, f"{day}.jsonl")
+
+
+def offsets_path(directory: str, day: str) -> str:
+    return os.path.join(directory, f"{day}.offsets.json")
+
+
+def rising_path(directory: str, day: str) -> str:
+    return os.path.join(directory, f"{day}.rising.json")
+
+
+def read_rising(directory: str, day: str) -> list:
+    """读取某个交易日最后记录的上涨板块排名，没有记录时返回空列表"""
+    try:
+        with open(rising_path(directory, day), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def logged_days(directory: str) -> list:
+    """有事件日志的交易日，升序"""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(name[:8] for name in names if name.endswith('.jsonl') and name[:8].isdigit())
+
+
+def read_lines(path: str, offset: int = 0):
+    """逐行读取事件日志，产出 (行首偏移, 事件)，跳过崩溃时写了一半的行"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                start = offset
+                offset += len(line)
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield start, json.loads(line)
+                except ValueError:
+                    continue
+    except FileNotFoundError:
+        pass
+
+
+def seek_offset(directory: str, day: str, start: int) -> int:
+    """分钟数 >= start 的事件在日志中最早出现的位置，没有分钟偏移表或表已失效时返回 0"""
+    try:
+        with open(offsets_path(directory, day), encoding='utf-8') as f:
+            offsets = json.load(f)
+        size, first = offsets['size'], offsets['first']
+        if size > os.path.getsize(day_path(directory, day)) or len(first) != MINUTES:
+            return 0
+    except (OSError, ValueError, KeyError, TypeError):
+        return 0
+    start = min(max(start, 0), MINUTES - 1)
+    # 表只覆盖 size 之前的内容，之后追加的行都在 size 之后
+    return size if first[start] < 0 else first[start]
+
+
+def read_day(directory: str, day: str, start: int = None) -> list:
+    """读取某个交易日的事件日志；给出 start（分钟数）时按分钟偏移表跳过之前的部分，
+    返回的事件包含全部 >= start 的事件，也可能包含少量更早的事件"""
+    offset = 0 if start is None else seek_offset(directory, day, start)
+    return [row for _, row in read_lines(day_path(directory, day), offset)]
+
+
+class EventLog:
+    """按交易日追加写入的去重事件日志（每天一个 JSON Lines 文件）
+
+    每次 append 后 flush 到操作系统，进程崩溃不丢数据；fsync 按条数或时间间隔分批进行，
+    append 之外由调用方在空闲时调用 maybe_sync，退出前调用 close。
+    每批事件按分钟排序后写入，并维护分钟偏移表（{day}.offsets.json，随 fsync 落盘）：
+    first[m] 为分钟数 >= m 的事件最早出现的行首偏移，按时间范围读取时可以跳过之前的部分。
+    """
+
+    def __init__(self, directory: str, fsync_every: int = 200, fsync_interval: float = 1.0):
+        self.directory = directory
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.day = None
+        self.file = None
+        self.seen = set()
+        self.pending = 0
+        self.last_sync = time.monotonic()
+        self.rising = None
+        self.first = None
+        self.offsets_dirty = False
+
+    def _open(self, day: str) -> None:
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+        self.seen = set()
+        self.first = [-1] * MINUTES
+        for offset, row in read_lines(day_path(self.directory, day)):
+            self.seen.add(event_key(row))
+            self._index(event_minute(row), offset)
+        self.offsets_dirty = True
+        self.file = open(day_path(self.directory, day), 'ab')
+        # 上次崩溃可能留下没有换行的半行，补上换行避免与新行粘连
+        if self.file.tell() > 0:
+            with open(day_path(self.directory, day), 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self.file.write(b'\n')
+        self.day = day
+
+    def _index(self, minute: int, offset: int) -> None:
+        minute = min(max(minute, 0), MINUTES - 1)
+        # 每个分钟只在第一次出现 >= 它的事件时赋值，整天总共最多赋值 MINUTES 次
+        while minute >= 0 and self.first[minute] < 0:
+            self.first[minute] = offset
+            minute -= 1
+
+    def append(self, rows, now: datetime = None) -> list:
+        """写入尚未记录的事件，返回本次新增的事件；now 默认为当前北京时间"""
+        day = trading_day(now)
+        if day != self.day:
+            self._open(day)
+        new_rows = []
+        for row in rows:
+            key = event_key(row)
+            if key not in self.seen:
+                self.seen.add(key)
+                new_rows.append(row)
+        if new_rows:
+            offset = self.file.tell()
+            lines = []
+            for minute, row in sorted(((event_minute(row), row) for row in new_rows), key=lambda item: item[0]):
+                line = json.dumps(row, ensure_ascii=False).encode('utf-8') + b'\n'
+                self._index(minute, offset)
+                offset += len(line)
+                lines.append(line)
+            self.file.write(b''.join(lines))
+            self.file.flush()
+            self.pending += len(new_rows)
+            self.offsets_dirty = True
+        if self.pending >= self.fsync_every:
+            self.sync()
+        else:
+            self.maybe_sync()
+        return new_rows
+
+    def record_rising(self, ranking, now: datetime = None) -> None:
+        """记录当日最新的上涨板块排名（整体原子替换），与上次相同时不写"""
+        day = trading_day(now)
+        if (day, ranking) == self.rising:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = rising_path(self.directory, day)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(ranking, f, ensure_ascii=False)
+        os.replace(f"{path}.tmp", path)
+        self.rising = (day, ranking)
+
+    def maybe_sync(self) -> None:
+        """距上次 fsync 超过 fsync_interval 且有未落盘的事件时 fsync"""
+        if self.pending and time.monotonic() - self.last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self) -> None:
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            if self.offsets_dirty:
+                self._write_offsets()
+        self.pending = 0
+        self.last_sync = time.monotonic()
+
+    def _write_offsets(self) -> None:
+        # 偏移表只描述已经 fsync 的 size 字节，整体原子替换
+        path = offsets_path(self.directory, self.day)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({'size': self.file.tell(), 'first': self.first}, f, separators=(',', ':'))
+        os.replace(f"{path}.tmp", path)
+        self.offsets_dirty = False
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+
+class EventIndex:
+    """某个交易日事件的内存时间索引，按分钟有序，范围查询用二分查找"""
+
+    def __init__(self, day: str = None):
+        self.day = day
+        self.minutes = []
+        self.rows = []
+        self.keys = set()
+
+    def add(self, rows, day: str) -> list:
+        """加入尚未索引的事件，返回新增的事件；跨日时先清空"""
+        if day != self.day:
+            self.__init__(day)
+        new_rows = []
+        for row in rows:
+            key = event_key(row)
+            if key in self.keys:
+                continue
+            self.keys.add(key)
+            minute = event_minute(row)
+            # 事件基本按时间到达，通常直接追加到末尾
+            i = bisect.bisect_right(self.minutes, minute)
+            self.minutes.insert(i, minute)
+            self.rows.insert(i, row)
+            new_rows.append(row)
+        return new_rows
+
+    def query(self, start: int = None, end: int = None, concepts=None) -> list:
+        lo = 0 if start is None else bisect.bisect_left(self.minutes, start)
+        hi = len(self.minutes) if end is None else bisect.bisect_right(self.minutes, end)
+        rows = self.rows[lo:hi]
+        if concepts:
+            rows = [row for row in rows if row.get('板块名称') in concepts]
+        return rows
+
+    def __len__(self):
+        return len(self.rows)
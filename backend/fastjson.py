@@ -0,0 +1,41 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson 是可选依赖，缺失时使用调优过的标准库编码器
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# 紧凑输出、不转义中文、不做循环引用检查
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), check_circular=False)
+
+
+def dumps(obj) -> bytes:
+    """编码为 UTF-8 JSON 字节，NaN 等非法值在 orjson 下输出为 null"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return _encoder.encode(obj).encode("utf-8")
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def packb(obj) -> bytes:
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def supported_formats():
+    """可通过 format 查询参数选择的响应格式"""
+    formats = ["json", "columns"]
+    if msgpack is not None:
+        formats.append("msgpack")
+    return formats
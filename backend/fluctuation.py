@@ -1,11 +1,13 @@
-import re, os
-import json
+import asyncio
+import os
+import numpy as np
 import pandas as pd
-import requests
 import time as t
 from typing import Optional
-import sys
-import akshare as ak
+from http_client import get_session, get_executor
+from concept_index import ConceptIndex
+import fastjson
+from metrics import STAGE_SECONDS
 
 
 def filter_stock_data(df: pd.DataFrame) -> Optional[pd.DataFrame]:
@@ -35,28 +37,6 @@ def filter_stock_data(df: pd.DataFrame) -> Optional[pd.DataFrame]:
     return df
 
 
-def get_resource_path(relative_path):
-    """获取资源文件的路径，支持开发环境和打包环境"""
-    if hasattr(sys, '_MEIPASS'):
-        # PyInstaller 创建临时文件夹 _MEIpass，并将路径存储在 _MEIPASS 中
-        base_path = sys._MEIPASS
-    else:
-        base_path = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(base_path, relative_path)
-
-# 设置 akshare 的数据文件路径
-akshare_path = get_resource_path('akshare')
-os.environ['AKSHARE_HOME'] = akshare_path
-# 确保数据目录存在
-file_fold_path = os.path.join(akshare_path, 'file_fold')
-os.makedirs(file_fold_path, exist_ok=True)
-
-# 创建默认的 calendar.json 文件（如果不存在）
-calendar_path = os.path.join(file_fold_path, 'calendar.json')
-if not os.path.exists(calendar_path):
-    with open(calendar_path, 'w', encoding='utf-8') as f:
-        json.dump({"calendar": []}, f)
-
 HEADERS = {
     'Accept': '*/*',
     'Accept-Language': 'zh-CN,zh-TW;q=0.9,zh;q=0.8,en-US;q=0.7,en;q=0.6,ja;q=0.5',
@@ -71,38 +51,287 @@ HEADERS = {
 }
 
 def parse_jsonp(jsonp_str):
-    if not jsonp_str or not isinstance(jsonp_str, str):
+    """解析 JSONP（str 或 bytes）。按下标切出回调括号内的内容，不用正则扫描整个响应体"""
+    if not jsonp_str or not isinstance(jsonp_str, (str, bytes)):
         print("错误：输入不是有效的字符串")
         return None
-    match = re.match(r'^[a-zA-Z0-9_]+\s*\(\s*(.*)\s*\)\s*;?\s*$', jsonp_str.strip(), re.DOTALL)
-    if match:
-        json_str = match.group(1)
-        data = json.loads(json_str)
-        return data
-    else:
-        return json.loads(jsonp_str)
-
-
-def getChanges(concept_df: pd.DataFrame):
-    risingConceptsCodes = getRisingConcepts()
-    # 先取出在risingConceptsCodes中的部分，按顺序排列
-    ordered_df = concept_df[concept_df['板块代码'].isin(risingConceptsCodes)].set_index('板块代码').loc[risingConceptsCodes].reset_index()
-    # 剩下的部分
-    rest_df = concept_df[~concept_df['板块代码'].isin(risingConceptsCodes)]
-    # 拼接
-    changedConcepts_df = pd.concat([ordered_df, rest_df], ignore_index=True)
-
-    response = requests.get(
-        'https://push2ex.eastmoney.com/getAllStockChanges?type=8201,8202,8193,4,32,64,8207,8209,8211,8213,8215,8204,8203,8194,8,16,128,8208,8210,8212,8214,8216&cb=jQuery35108409427522251944_1753773534498&ut=7eea3edcaed734bea9cbfc24409ed989&pageindex=0&pagesize=1000&dpt=wzchanges&_=1753773534514',
-        headers={**HEADERS, 'Referer': 'https://quote.eastmoney.com/changes/'},
+    if isinstance(jsonp_str, bytes):
+        jsonp_str = jsonp_str.decode('utf-8')
+    start = jsonp_str.find('(')
+    end = jsonp_str.rfind(')')
+    # 形如 callback_123( ... ); 的响应只取括号内的部分，其余按纯 JSON 解析
+    if 0 < start < end and jsonp_str[end + 1:].strip() in ('', ';'):
+        if jsonp_str[:start].strip().replace('_', '').isalnum():
+            return fastjson.loads(jsonp_str[start + 1:end])
+    return fastjson.loads(jsonp_str)
+
+
+# 可以用环境变量指向本地的替身服务器（见 benchmarks/fake_eastmoney.py）
+CHANGES_URL = os.environ.get('EASTMONEY_CHANGES_URL', 'https://push2ex.eastmoney.com/getAllStockChanges')
+CLIST_URL = os.environ.get('EASTMONEY_CLIST_URL', 'https://79.push2.eastmoney.com/api/qt/clist/get')
+CHANGES_TYPES = '8201,8202,8193,4,32,64,8207,8209,8211,8213,8215,8204,8203,8194,8,16,128,8208,8210,8212,8214,8216'
+CHANGES_PAGE_SIZE = 1000
+
+
+def changes_request(pageindex: int, pagesize: int = CHANGES_PAGE_SIZE):
+    """一页异动请求的 (url, params, headers)，同步与异步拉取共用"""
+    params = {
+        'type': CHANGES_TYPES,
+        'cb': 'jQuery35108409427522251944_1753773534498',
+        'ut': '7eea3edcaed734bea9cbfc24409ed989',
+        'pageindex': pageindex,
+        'pagesize': pagesize,
+        'dpt': 'wzchanges',
+        '_': int(t.time() * 1000),
+    }
+    return CHANGES_URL, params, {**HEADERS, 'Referer': 'https://quote.eastmoney.com/changes/'}
+
+
+def fetch_changes_raw(pageindex: int, pagesize: int = CHANGES_PAGE_SIZE) -> bytes:
+    """拉取一页异动的原始响应体"""
+    url, params, headers = changes_request(pageindex, pagesize)
+    with STAGE_SECONDS.time("http_changes"):
+        response = get_session().get(url, params=params, headers=headers)
+    return response.content
+
+
+async def fetch_changes_raw_async(client, pageindex: int, pagesize: int = CHANGES_PAGE_SIZE) -> bytes:
+    """fetch_changes_raw 的异步版本，client 为 http_client.AsyncHTTPClient"""
+    url, params, headers = changes_request(pageindex, pagesize)
+    with STAGE_SECONDS.time("http_changes"):
+        return await client.get(url, params=params, headers=headers)
+
+
+def parse_changes_page(raw: bytes):
+    """解析一页异动，返回 (当日总条数, 本页事件列表)"""
+    with STAGE_SECONDS.time("parse"):
+        data = parse_jsonp(raw)
+    page = (data or {}).get('data') or {}
+    return int(page.get('tc') or 0), page.get('allstock') or []
+
+
+class ChangesFetcher:
+    """分页拉取当日全部异动并缓存，之后每轮只下载新增事件所在的页
+
+    服务器返回的顺序（按时间升序或降序）从第一页推断；缓存与新页衔接不上、
+    总数变少（跨日）或顺序无法判断时退回全量拉取。
+    第一页包含当日总数和最新（降序）或最早（升序）的事件，原始响应与上一轮逐字节相同时
+    说明没有新事件，直接返回缓存，不做解析；version 只在事件列表变化时递增。
+    增量拉取时只对新增的行去重；arrivals 按到达顺序只追加去重后的新事件，
+    调用方用 since 取上次之后新到的事件，不必重新处理整天的列表。
+    """
+
+    def __init__(self, page_size: int = CHANGES_PAGE_SIZE):
+        self.page_size = page_size
+        self.events = []  # 服务器顺序
+        self.unique = []
+        self.arrivals = []  # 到达顺序，只追加；跨日时换成新列表并递增 generation
+        self.generation = 0
+        self.order = None
+        self.version = 0
+        self._first_raw = None
+        self._seen = set()  # unique 中的键
+        self._arrived = set()  # 当天 arrivals 中的键；全量拉取时翻页错位漏掉的行之后再出现也不重复记录
+
+    def fetch(self):
+        """同步拉取，其余页在线程池中并行"""
+        steps = self._steps(fetch_changes_raw(0, self.page_size))
+        done, value = self._resume(steps)
+        while not done:
+            done, value = self._resume(steps, self._fetch_pages(value))
+        return value
+
+    async def fetch_async(self, client, executor=None):
+        """事件循环中只发 HTTP 请求（其余页并发），解析和去重交给 executor；
+        client 为 http_client.AsyncHTTPClient"""
+        loop = asyncio.get_running_loop()
+        steps = self._steps(await fetch_changes_raw_async(client, 0, self.page_size))
+        done, value = await loop.run_in_executor(executor, self._resume, steps)
+        while not done:
+            raws = await self._fetch_pages_async(client, value)
+            done, value = await loop.run_in_executor(executor, self._resume, steps, raws)
+        return value
+
+    @staticmethod
+    def _resume(steps, raws=None):
+        """推进一步拉取流程，返回 (是否结束, 还需要的页码或最终结果)；
+        StopIteration 不能穿过 Future，在这里转换为返回值"""
+        try:
+            return False, steps.send(raws)
+        except StopIteration as stop:
+            return True, stop.value
+
+    def _steps(self, raw):
+        """不做 IO 的拉取流程：yield 还需要的页码，send 回这些页的原始响应（按页序），
+        解析、合并和去重都在这里完成，最后返回去重后的事件"""
+        if raw == self._first_raw:
+            return self.unique
+        first_tc, first_rows = parse_changes_page(raw)
+        order = self._infer_order(first_rows)
+        cached = self.events
+        count = len(cached)
+        events = None
+        added = None  # 增量拉取时新增的行（服务器顺序）
+        if cached and order is not None and order == self.order and count <= first_tc:
+            if first_tc == count:
+                # 没有新事件：降序时首行不变、升序时总数不变
+                if order == 'asc' or first_rows[:1] == cached[:1]:
+                    events = cached
+            elif order == 'desc':
+                added = yield from self._fetch_desc(first_tc, first_rows, cached)
+                if added is not None:
+                    events = added + cached
+            else:
+                added = yield from self._fetch_asc(first_tc, first_rows, cached)
+                if added is not None:
+                    events = cached + added
+        if events is None:
+            events = first_rows + self._parse_pages((yield range(1, self._page_count(first_tc))))
+        # 缓存保持服务器原样，条数才能与 tc 对齐
+        if events is not cached:
+            self.events = events
+            if added is not None:
+                self._extend(added, prepend=order == 'desc')
+            else:
+                # 总数变少说明跨日，之前的事件不再属于当天
+                self._reset(events, new_day=first_tc < count)
+            self.version += 1
+        self.order = order
+        self._first_raw = raw
+        return self.unique
+
+    def _page_count(self, total):
+        return -(-total // self.page_size)
+
+    def _fetch_pages(self, pages):
+        # 有界线程池并行拉取，按页序返回原始响应
+        return list(get_executor().map(lambda i: fetch_changes_raw(i, self.page_size), pages))
+
+    async def _fetch_pages_async(self, client, pages):
+        # 并发数由 client 的连接池限制
+        return await asyncio.gather(*(fetch_changes_raw_async(client, i, self.page_size) for i in pages))
+
+    @staticmethod
+    def _parse_pages(raws):
+        # 按页序合并
+        rows = []
+        for raw in raws:
+            rows.extend(parse_changes_page(raw)[1])
+        return rows
+
+    def _fetch_desc(self, total, first_rows, cached):
+        # 新事件在最前面的 new 行，需要拉到第 new 行所在页用于校验衔接
+        new = total - len(cached)
+        last_page = new // self.page_size
+        rows = first_rows + self._parse_pages((yield range(1, last_page + 1)))
+        if len(rows) <= new or rows[new] != cached[0]:
+            return None
+        return rows[:new]
+
+    def _fetch_asc(self, total, first_rows, cached):
+        # 新事件在末尾，从缓存最后一行所在页开始拉，用该行校验衔接
+        start_page = (len(cached) - 1) // self.page_size
+        pages = range(start_page, self._page_count(total))
+        rows = self._parse_pages((yield [p for p in pages if p != 0]))
+        if start_page == 0:
+            rows = first_rows + rows
+        offset = len(cached) - 1 - start_page * self.page_size
+        if len(rows) <= offset or rows[offset] != cached[-1]:
+            return None
+        return rows[offset + 1:]
+
+    @staticmethod
+    def _infer_order(rows):
+        if len(rows) < 2:
+            return None
+        first, last = int(rows[0].get('tm', 0)), int(rows[-1].get('tm', 0))
+        if first == last:
+            return None
+        return 'asc' if first < last else 'desc'
+
+    @staticmethod
+    def _key(row):
+        return (row.get('c'), row.get('t'), row.get('tm'), row.get('i'))
+
+    def _extend(self, added, prepend):
+        # 翻页期间有新事件插入时，相邻页可能出现重复行；只检查新增的行
+        fresh = []
+        for row in added:
+            key = self._key(row)
+            if key not in self._seen:
+                self._seen.add(key)
+                fresh.append(row)
+        self.unique = fresh + self.unique if prepend else self.unique + fresh
+        self._arrive(fresh)
+
+    def _arrive(self, rows):
+        for row in rows:
+            key = self._key(row)
+            if key not in self._arrived:
+                self._arrived.add(key)
+                self.arrivals.append(row)
+
+    def _reset(self, events, new_day):
+        """全量拉取后重建去重列表；同一天内之前已经到达的事件不再记为新到达"""
+        if new_day:
+            self.arrivals = []
+            self._arrived = set()
+            self.generation += 1
+        self._seen = set()
+        unique = []
+        for row in events:
+            key = self._key(row)
+            if key not in self._seen:
+                self._seen.add(key)
+                unique.append(row)
+        self.unique = unique
+        self._arrive(unique)
+
+    def since(self, mark=None):
+        """返回 (mark 之后新到达的事件, 新的 mark)；mark 为 None 或跨日后从当天第一条开始"""
+        generation, count = mark or (None, 0)
+        if generation != self.generation:
+            count = 0
+        return self.arrivals[count:], (self.generation, len(self.arrivals))
+
+
+_changes_fetcher = ChangesFetcher()
+# 上一轮的输入（事件版本、上涨板块、板块索引）和结果，输入不变时直接复用结果
+_last_changes = (None, None)
+# 上一次解析、过滤并格式化（不含板块名称）的事件：(事件列表, 事件版本, 结果)。
+# 交易时段上涨板块排名几乎每轮都变，只有事件版本变化时才需要重新构建
+_last_frame = (None, None, None)
+
+
+def getChanges(concept_index: ConceptIndex):
+    """返回格式化后的异动列表。上游没有新数据时返回上一轮的同一个 DataFrame 对象，
+    调用方可以用 `is` 判断并跳过下游处理"""
+    # 上涨板块与异动列表互不依赖，并发请求
+    rising_future = get_executor().submit(getRisingConcepts)
+    with STAGE_SECONDS.time("fetch_changes"):
+        events = _changes_fetcher.fetch()
+    with STAGE_SECONDS.time("wait_rising"):
+        risingConceptsCodes = rising_future.result()
+    return build_changes(events, _changes_fetcher.version, risingConceptsCodes, concept_index)
+
+
+async def getChangesAsync(client, concept_index: ConceptIndex, executor=None):
+    """getChanges 的异步版本：两路请求在事件循环中并发，解析响应、构建和格式化 DataFrame 交给 executor"""
+    async def fetch_changes():
+        with STAGE_SECONDS.time("fetch_changes"):
+            return await _changes_fetcher.fetch_async(client, executor)
+
+    events, risingConceptsCodes = await asyncio.gather(fetch_changes(), getRisingConceptsAsync(client, executor))
+    return await asyncio.get_running_loop().run_in_executor(
+        executor, build_changes, events, _changes_fetcher.version, risingConceptsCodes, concept_index
     )
 
-    # 解析JSONP响应
-    data = parse_jsonp(response.text)
 
-    if data and 'data' in data and 'allstock' in data['data']:
+def event_frame(events):
+    """把原始事件列表转换为过滤后的DataFrame（股票代码、股票名称、时间、类型、涨跌幅等列）"""
+    with STAGE_SECONDS.time("build_frame"):
         # 转换为DataFrame
-        df = pd.DataFrame(data['data']['allstock'])
+        df = pd.DataFrame(events)
 
         # 重命名列名，使其更易读
         column_mapping = {
@@ -125,82 +354,141 @@ def getChanges(concept_df: pd.DataFrame):
                 if not df.empty:
                     df['涨跌幅'] = info_df[0]
 
-        df = filter_stock_data(df)
-
-        # 转换为指定的输出格式
-        def format_time(tm):
-            """将时间戳格式化为 HH:MM"""
-            tm_str = str(tm)
-            if len(tm_str) < 6:
-                tm_str = tm_str.zfill(6)
-            return f"{tm_str[:2]}:{tm_str[2:4]}"  # 只返回小时和分钟
-
-        # 创建新的DataFrame用于输出
-        output_df = pd.DataFrame()
-        output_df['股票代码'] = df['股票代码']
-        output_df['时间'] = df['时间'].apply(format_time)
-        output_df['名称'] = df['股票名称']
-        # 直接放原始类型和涨跌幅，便于调试
-        output_df['原始类型'] = df['类型']
-        output_df['原始涨跌幅'] = df['涨跌幅']
-
-        # 类型映射字典
-        type_mapping = {
-            '8201': '火箭发射',
-            '8202': '快速反弹',
-            '8193': '大笔买入',
-            '4': '封涨停板',
-            '32': '打开跌停板',
-            '64': '有大买盘',
-            '8207': '竞价上涨',
-            '8209': '高开5日线',
-            '8211': '向上缺口',
-            '8213': '60日新高',
-            '8215': '60日大幅上涨',
-            '8204': '加速下跌',
-            '8203': '高台跳水',
-            '8194': '大笔卖出',
-            '8': '封跌停板',
-            '16': '打开涨停板',
-            '128': '有大卖盘',
-            '8208': '竞价下跌',
-            '8210': '低开5日线',
-            '8212': '向下缺口',
-            '8214': '60日新低',
-            '8216': '60日大幅下跌'
-        }
-        # 增加映射后的类型和相关信息，便于对比
-        output_df['类型'] = df['类型'].astype(str).map(type_mapping).fillna('未知类型')
-        # 先加一列'四舍五入取整'，在加百分号前处理
-        output_df['四舍五入取整'] = df['涨跌幅'].apply(lambda x: int(round(x * 100)) if pd.notnull(x) else None)
-        output_df['相关信息'] = df['涨跌幅'].apply(
-            lambda x: f"%+.2f" % (x * 100) + "%" if pd.notnull(x) else 'NaN'
-        )
-
-
-        first_concept_df = changedConcepts_df.drop_duplicates(subset=['股票代码'], keep='first')
-        output_df = pd.merge(output_df, first_concept_df[['股票代码', '板块名称']], on='股票代码', how='left')
-
-        output_df = output_df.sort_values('时间')
-
-        # 先排序再加上午/下午列
-        html_df = output_df[['板块名称', '时间', '名称', '相关信息','类型', '四舍五入取整']].copy()
-        def am_pm_col(tm):
-            hour = int(tm[:2])
-            return '上午' if hour < 12 else '下午'
-        html_df['上下午'] = html_df['时间'].apply(am_pm_col)
-        # 新增一列用于排序，转为分钟数
-        html_df['时间排序'] = html_df['时间'].apply(lambda tm: int(tm[:2])*60 + int(tm[3:5]))
-        html_df = html_df.sort_values(['上下午','板块名称', '时间排序'])
-        # 只在内存处理和去重，不再写入 static/changes.csv
+    with STAGE_SECONDS.time("filter"):
+        return filter_stock_data(df)
+
+
+def build_changes(events, version, risingConceptsCodes, concept_index: ConceptIndex):
+    """把事件列表转换为输出格式；输入（事件版本、上涨板块、板块索引）与上一轮相同时返回上一轮的结果。
+    只有上涨板块变化时复用已格式化的事件，只重新计算所属板块和排序"""
+    global _last_changes, _last_frame
+    key = (version, tuple(risingConceptsCodes), id(concept_index))
+    if key == _last_changes[0]:
+        return _last_changes[1]
+    _last_changes = (key, None)
+
+    if events:
+        if events is _last_frame[0] and version == _last_frame[1]:
+            base = _last_frame[2]
+        else:
+            df = event_frame(events)
+            with STAGE_SECONDS.time("format"):
+                base = format_base(df)
+            _last_frame = (events, version, base)
+
+        # 只为发生异动的股票查索引，取上涨排名最靠前的所属板块
+        with STAGE_SECONDS.time("concepts"):
+            first_concepts = concept_index.first_concepts(base['股票代码'], risingConceptsCodes)
+        with STAGE_SECONDS.time("sort"):
+            result = order_changes(base, first_concepts)
+        _last_changes = (key, result)
+        return result
+
+
+def events_since(mark=None):
+    """返回 (mark 之后新拉取到的原始事件, 新的 mark)，见 ChangesFetcher.since"""
+    return _changes_fetcher.since(mark)
+
+
+def format_events(events, concept_index: ConceptIndex):
+    """把一批原始事件转换为与 getChanges 相同的列，但不按名称+类型去重；过滤后没有事件时返回 None"""
+    df = event_frame(events)
+    if df is None or df.empty:
+        return None
+    first_concepts = concept_index.first_concepts(df['股票代码'], latest_rising_concepts())
+    return format_changes(df, first_concepts, dedupe=False)
+
+
+# 类型映射字典
+TYPE_MAPPING = {
+    '8201': '火箭发射',
+    '8202': '快速反弹',
+    '8193': '大笔买入',
+    '4': '封涨停板',
+    '32': '打开跌停板',
+    '64': '有大买盘',
+    '8207': '竞价上涨',
+    '8209': '高开5日线',
+    '8211': '向上缺口',
+    '8213': '60日新高',
+    '8215': '60日大幅上涨',
+    '8204': '加速下跌',
+    '8203': '高台跳水',
+    '8194': '大笔卖出',
+    '8': '封跌停板',
+    '16': '打开涨停板',
+    '128': '有大卖盘',
+    '8208': '竞价下跌',
+    '8210': '低开5日线',
+    '8212': '向下缺口',
+    '8214': '60日新低',
+    '8216': '60日大幅下跌'
+}
+TYPE_DTYPE = pd.CategoricalDtype(list(TYPE_MAPPING.values()) + ['未知类型'])
+SESSION_DTYPE = pd.CategoricalDtype(['上午', '下午'], ordered=True)
+# 一天内每分钟对应的 HH:MM 文本，按分钟数查表代替逐行格式化
+MINUTE_LABELS = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60)], dtype=object)
+
+
+def format_changes(df: pd.DataFrame, first_concepts: dict, dedupe: bool = True) -> pd.DataFrame:
+    """把过滤后的异动转换为输出格式，整列运算，时间只解析一次
+
+    Args:
+        df: filter_stock_data 的结果，需要包含'股票代码'、'时间'、'股票名称'、'类型'和'涨跌幅'列
+        first_concepts: 股票代码 → 板块名称
+        dedupe: 是否按名称+类型去重，只保留最后一次
+
+    Returns:
+        按上下午、板块名称、时间排序（并按名称+类型去重）后的DataFrame
+    """
+    return order_changes(format_base(df), first_concepts, dedupe)
+
+
+def format_base(df: pd.DataFrame) -> pd.DataFrame:
+    """format_changes 中与上涨板块无关的部分：除板块名称外的输出列，保持输入顺序"""
+    # 时间形如 93012（HHMMSS），整数运算得到小时和分钟数
+    tm = pd.to_numeric(df['时间'], errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+    hours = tm // 10000
+    minutes = np.clip(hours * 60 + (tm // 100) % 100, 0, len(MINUTE_LABELS) - 1)
+    # filter_stock_data 已经排除了涨跌幅为空的行；一天内涨跌幅取值有限，只格式化去重后的值
+    pct = df['涨跌幅'].to_numpy(dtype=np.float64) * 100
+    pct_values, pct_inverse = np.unique(pct, return_inverse=True)
+    pct_labels = np.char.mod('%+.2f%%', pct_values).astype(object)[pct_inverse]
+    # 类型同理，先去重再映射
+    type_codes, type_values = pd.factorize(df['类型'], use_na_sentinel=False)
+    type_names = pd.Index(type_values.astype(str)).map(TYPE_MAPPING).fillna('未知类型')
+
+    return pd.DataFrame({
+        '时间': MINUTE_LABELS[minutes],
+        '名称': df['股票名称'],
+        '相关信息': pct_labels,
+        '类型': pd.Categorical(np.asarray(type_names, dtype=object)[type_codes], dtype=TYPE_DTYPE),
+        '四舍五入取整': np.rint(pct).astype(np.int64),
+        '上下午': pd.Categorical.from_codes((hours >= 12).astype(np.int8), dtype=SESSION_DTYPE),
+        '时间排序': minutes,
+        '股票代码': df['股票代码'],
+    })
+
+
+def order_changes(base: pd.DataFrame, first_concepts: dict, dedupe: bool = True) -> pd.DataFrame:
+    """按所属板块补上板块名称列，排序（并按名称+类型去重）；base 为 format_base 的结果"""
+    html_df = pd.DataFrame({
+        '板块名称': pd.Categorical(base['股票代码'].map(first_concepts)),
+        **{column: base[column] for column in base.columns},
+    })
+    # 稳定排序，同一分钟内保持原始顺序
+    html_df = html_df.sort_values(['上下午', '板块名称', '时间排序'], kind='stable')
+    # 只在内存处理和去重，不再写入 static/changes.csv
+    if dedupe:
         html_df = html_df.drop_duplicates(subset=['名称', '类型'], keep='last')
-        return html_df
+    return html_df
 
 
+_last_rising = (None, None)
 
-def getRisingConcepts():
 
-    url = "https://79.push2.eastmoney.com/api/qt/clist/get"
+def rising_request():
+    """上涨板块请求的 (url, params, headers)"""
     params = {
         "pn": "1",
         "pz": "200",
@@ -214,12 +502,34 @@ def getRisingConcepts():
         "fields": "f3,f12,f14,f20",
         "_": "1626075887768",
     }
-    response=requests.get(url=url,params=params,headers={**HEADERS, 'Referer': 'https://quote.eastmoney.com/center/gridlist.html'})
-    data = parse_jsonp(response.text)['data']['diff']
+    return CLIST_URL, params, {**HEADERS, 'Referer': 'https://quote.eastmoney.com/center/gridlist.html'}
+
+
+def parse_rising(raw: bytes):
+    global _last_rising
+    # 响应未变化时复用上一轮的结果
+    if raw == _last_rising[0]:
+        return _last_rising[1]
+    data = parse_jsonp(raw)['data']['diff']
     bkcodes = [ x['f12'] for x in data if int(x['f20'])<5000000000000 and not '昨日' in x['f14']]
+    _last_rising = (raw, bkcodes)
     return bkcodes
 
 
+def latest_rising_concepts():
+    """最近一次拉取到的上涨板块代码，按涨幅名次排列"""
+    return _last_rising[1] or []
+
 
+def getRisingConcepts():
+    url, params, headers = rising_request()
+    with STAGE_SECONDS.time("fetch_rising"):
+        response=get_session().get(url=url,params=params,headers=headers)
+    return parse_rising(response.content)
 
 
+async def getRisingConceptsAsync(client, executor=None):
+    url, params, headers = rising_request()
+    with STAGE_SECONDS.time("fetch_rising"):
+        raw = await client.get(url, params=params, headers=headers)
+    return await asyncio.get_running_loop().run_in_executor(executor, parse_rising, raw)
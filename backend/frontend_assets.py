@@ -0,0 +1,127 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+
+try:
+    import brotli
+except ImportError:  # brotli 是可选依赖，缺失时只提供 gzip
+    brotli = None
+
+# vite 输出的 assets/[name]-[hash].[ext]，内容变化时文件名跟着变，可以长期缓存
+HASHED_NAME = re.compile(r"[.-][A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+COMPRESSIBLE_TYPES = ("application/javascript", "application/json", "application/xml", "image/svg+xml",
+                      "application/wasm", "application/manifest+json")
+MIN_COMPRESS_SIZE = 1024
+# 压缩后至少小 10% 才保留压缩版本
+MIN_SAVING = 0.9
+
+
+def _media_type(path):
+    media_type, _ = mimetypes.guess_type(path)
+    if media_type is None and path.endswith((".js", ".mjs")):
+        media_type = "application/javascript"
+    return media_type or "application/octet-stream"
+
+
+def _compressible(media_type):
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES
+
+
+def parse_accept_encoding(header):
+    """返回 {编码: q 值}，q=0 表示明确拒绝"""
+    accepted = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+class Asset:
+    """dist 目录中的一个文件：原始内容、压缩版本（编码 -> 字节）、ETag 和缓存策略"""
+
+    __slots__ = ("media_type", "body", "encoded", "etag", "cache_control")
+
+    def __init__(self, body, media_type, cache_control):
+        self.media_type = media_type
+        self.body = body
+        self.cache_control = cache_control
+        self.etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        self.encoded = {}
+        if _compressible(media_type) and len(body) >= MIN_COMPRESS_SIZE:
+            variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants["br"] = brotli.compress(body, quality=11)
+            self.encoded = {k: v for k, v in variants.items() if len(v) <= len(body) * MIN_SAVING}
+
+    def negotiate(self, accept_encoding):
+        """按 Accept-Encoding 选择编码，返回 (编码或 None, 内容)；优先 br，其次 gzip"""
+        if self.encoded:
+            accepted = parse_accept_encoding(accept_encoding)
+            for coding in ("br", "gzip"):
+                q = accepted.get(coding, accepted.get("*", 0.0))
+                if coding in self.encoded and q > 0:
+                    return coding, self.encoded[coding]
+        return None, self.body
+
+    def variant_etag(self, coding):
+        # 不同编码的字节不同，强 ETag 也要区分
+        return self.etag if coding is None else f'{self.etag[:-1]}-{coding}"'
+
+    def not_modified(self, if_none_match):
+        if not if_none_match:
+            return False
+        base = self.etag[:-1]
+        for tag in if_none_match.split(","):
+            tag = tag.strip().removeprefix("W/")
+            if tag == "*" or tag == self.etag or (tag.startswith(base + "-") and tag.endswith('"')):
+                return True
+        return False
+
+
+class FrontendManifest:
+    """启动时把 dist 目录整个读进内存，之后的请求不再访问文件系统
+
+    文件路径使用 / 分隔的相对路径作为键，找不到的路径按 SPA 路由返回 index.html。
+    """
+
+    def __init__(self, assets=None):
+        self.assets = assets or {}
+
+    @classmethod
+    def build(cls, dist_dir):
+        assets = {}
+        if not os.path.isdir(dist_dir):
+            return cls(assets)
+        for root, _, files in os.walk(dist_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                key = os.path.relpath(path, dist_dir).replace(os.sep, "/")
+                with open(path, "rb") as f:
+                    body = f.read()
+                hashed = key.startswith("assets/") and HASHED_NAME.search(name) is not None
+                assets[key] = Asset(body, _media_type(name), IMMUTABLE if hashed else REVALIDATE)
+        return cls(assets)
+
+    def __len__(self):
+        return len(self.assets)
+
+    def lookup(self, path):
+        """返回请求路径对应的 Asset，目录穿越或不存在时回退到 index.html，没有前端时返回 None"""
+        key = posixpath.normpath("/" + path).lstrip("/")
+        return self.assets.get(key) or self.assets.get("index.html")
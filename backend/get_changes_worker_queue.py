@@ -1,6 +1,24 @@
+import os
 import pandas as pd
+import signal
+import threading
 import time
-from fluctuation import getChanges
+from fluctuation import events_since, format_events, getChanges, latest_rising_concepts
+from concept_index import ConceptIndex
+from storage import read_frame, write_table
+from shm_transport import SnapshotRing
+import fastjson
+from event_log import EventLog
+from scheduler import AdaptiveScheduler, TradingCalendar
+import history
+import metrics
+from metrics import STAGE_SECONDS
+
+CYCLES = metrics.counter("sidecar_worker_cycles_total", "Changes worker polling cycles by result", ("result",))
+PAYLOAD_BYTES = metrics.histogram(
+    "sidecar_snapshot_payload_bytes", "Encoded size of each published changes snapshot",
+    buckets=(16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024),
+)
 
 def get_resource_path(relative_path):
     import sys, os
@@ -10,28 +28,183 @@ def get_resource_path(relative_path):
         base_path = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(base_path, relative_path)
 
-def worker(concept_df, queue, interval=3, batch_interval=300, batch_size=100):
+def load_concepts(concept_source):
+    """concept_source 为 DataFrame 或 storage 表路径；由 worker 自己内存映射读取，避免主进程 pickle 整张表"""
+    if not isinstance(concept_source, str):
+        return concept_source
+    try:
+        concept_df = read_frame(concept_source)
+        print(f"[get_changes_worker_queue] Successfully loaded concepts data from: {concept_source}")
+        return concept_df
+    except Exception as e:
+        print(f"[get_changes_worker_queue] Error loading concepts data: {e}")
+        return pd.DataFrame()
+
+
+def frame_rows(df):
+    # 分类列先转为 object，空值才能替换为 None
+    return df.astype(object).where(pd.notnull(df), None).to_dict(orient="records")
+
+
+def encode_snapshot(df):
+    """把 getChanges 的结果转为行列表并编码，返回 (rows, payload)"""
+    rows = frame_rows(df)
+    return rows, fastjson.dumps(rows)
+
+
+def archive_history(static_dir, calendar):
+    try:
+        with STAGE_SECONDS.time("history"):
+            history.archive(static_dir, calendar)
+    except Exception as e:
+        print(f"[get_changes_worker_queue] 整理历史分区失败: {e}")
+
+
+class ChangesCycle:
+    """worker 进程和 async 模式共用的每轮处理：编码并发布快照、写事件日志和上涨板块排名、
+    批量落盘最新的 changes 表、休市前整理历史分区、上报指标和心跳，以及停止时的收尾。
+
+    方法都是阻塞调用，async 模式在线程池中调用；publish(rows, payload) 发送按名称+类型去重后的快照，
+    publish_events(rows) 发送本轮新写入事件日志的事件，由调用方决定如何送达 API 进程。
+    """
+
+    def __init__(self, static_dir, concept_index, calendar, publish, publish_events=None, interval=3,
+                 batch_interval=300, batch_size=100, heartbeat=None, name="get_changes_worker_queue"):
+        self.static_dir = static_dir
+        self.changes_path = os.path.join(static_dir, "changes")
+        self.concept_index = concept_index
+        self.calendar = calendar
+        self.publish = publish
+        self.publish_events = publish_events
+        self.batch_interval = batch_interval
+        self.batch_size = batch_size
+        self.heartbeat = heartbeat
+        self.name = name
+        # 当日事件去重后追加写入日志，崩溃时最多丢失一个 fsync 批次
+        self.event_log = EventLog(os.path.join(static_dir, "events"))
+        self.scheduler = AdaptiveScheduler(
+            calendar, fast=min(1.0, interval), normal=interval, slow=max(6.0, interval),
+        )
+        self.buffered = 0  # 上次落盘后发布的快照数
+        self.last_write = time.time()
+        self.last_df = None
+        self.event_mark = None  # 已写入事件日志的位置，见 fluctuation.events_since
+
+    def start(self):
+        archive_history(self.static_dir, self.calendar)
+        if self.heartbeat is not None:
+            self.heartbeat.start()
+
+    def handle(self, df):
+        """处理一轮 getChanges 的结果，返回 (result, 新增事件数)。
+        上游没有新数据时 getChanges 返回上一轮的同一个对象，跳过编码、推送和写日志"""
+        if df is self.last_df:
+            return "unchanged", 0
+        with STAGE_SECONDS.time("encode"):
+            rows, payload = encode_snapshot(df)
+        PAYLOAD_BYTES.observe(len(payload))
+        self.publish(rows, payload)
+        with STAGE_SECONDS.time("event_log"):
+            # 快照已按名称+类型去重，事件日志只转换并写入上一轮之后新拉取到的事件；
+            # 只有上涨板块排名变化时没有新事件，不写日志
+            events, self.event_mark = events_since(self.event_mark)
+            frame = format_events(events, self.concept_index) if events else None
+            new_rows = self.event_log.append(frame_rows(frame)) if frame is not None else []
+            self.event_log.record_rising(self.concept_index.rising_ranking(latest_rising_concepts()))
+        if new_rows and self.publish_events is not None:
+            self.publish_events(new_rows)
+        self.buffered += 1
+        self.last_df = df
+        return "published", len(new_rows)
+
+    def finish(self, result, latency, new_events=0):
+        """记录本轮结果，按需落盘，返回下一轮前的等待秒数"""
+        CYCLES.inc(1, result)
+        STAGE_SECONDS.observe(latency, "cycle")
+        delay = self.scheduler.next_interval(latency=latency, new_events=new_events)
+        now = time.time()
+        idle = delay >= self.batch_interval
+        # 进入休市的长时间等待前也先落盘
+        if self.buffered >= self.batch_size or (now - self.last_write) >= self.batch_interval or idle:
+            self.flush(now)
+        if idle:
+            # 休市前把事件日志 fsync，并把已收盘的交易日整理进历史分区
+            self.event_log.sync()
+            archive_history(self.static_dir, self.calendar)
+        else:
+            # 没有新事件时 append 不会触发按时间的 fsync
+            self.event_log.maybe_sync()
+        if self.heartbeat is not None:
+            self.heartbeat.beat(result != "error", latency, delay)
+        return delay
+
+    def flush(self, now=None):
+        if not self.buffered:
+            return
+        try:
+            # 每个快照都是当日完整列表，只需落盘最新一个，原子替换旧文件
+            with STAGE_SECONDS.time("write_table"):
+                path = write_table(self.changes_path, self.last_df)
+            print(f"[{self.name}] 批量写入 {self.buffered} 次轮询中最新的 {len(self.last_df)} 条变更到 {path}", flush=True)
+            self.buffered = 0
+            self.last_write = now or time.time()
+        except Exception as e:
+            print(f"[{self.name}] 批量写入失败: {e}", flush=True)
+
+    def close(self):
+        """停止前落盘最新的 changes 表并关闭事件日志"""
+        self.flush()
+        self.event_log.close()
+
+
+def worker(concept_source, queue, interval=3, batch_interval=300, batch_size=100, shm_name=None, heartbeat=None,
+           metrics_queue=None, static_dir=None):
+    """轮询 getChanges。每个快照只编码一次：写入共享内存后向 queue 发送 ("shm", seq, slot)，
+    没有共享内存或快照超过槽位容量时发送 ("bytes", payload)；新写入事件日志的事件以 ("events", payload) 发送。
+    轮询间隔由 AdaptiveScheduler 按交易时段调整，interval 为竞价时段的常规间隔。
+    heartbeat 为 supervisor.Heartbeat 时每轮上报结果、耗时和下一轮前的等待时间；
+    metrics_queue 用于把本进程的指标交给 API 进程的 /metrics；static_dir 默认为 static 目录。
+    heartbeat.stop 被设置（supervisor 停止或重启 worker）或收到 SIGTERM 时结束当前一轮，
+    落盘最新的 changes 表并关闭事件日志后退出"""
     print("[get_changes_worker_queue] 启动，推送到主进程Queue并定时批量写入磁盘")
-    changes_path = get_resource_path("static/changes.csv")
-    change_buffer = []
-    last_write = time.time()
-    while True:
+    static_dir = static_dir or get_resource_path("static")
+    # 板块索引只在启动时构建一次
+    concept_index = ConceptIndex.from_frame(load_concepts(concept_source))
+    ring = SnapshotRing.attach(shm_name) if shm_name else None
+
+    def publish(rows, payload):
+        with STAGE_SECONDS.time("ipc"):
+            published = ring.publish(payload) if ring is not None else None
+            if published is None:
+                queue.put(("bytes", payload))
+            else:
+                queue.put(("shm",) + published)
+
+    def publish_events(rows):
+        queue.put(("events", fastjson.dumps(rows)))
+
+    cycle = ChangesCycle(
+        static_dir, concept_index, TradingCalendar.load(get_resource_path("akshare/file_fold/calendar.json")),
+        publish, publish_events, interval=interval, batch_interval=batch_interval, batch_size=batch_size, heartbeat=heartbeat,
+    )
+    exporter = None
+    if metrics_queue is not None:
+        exporter = metrics.Exporter(metrics_queue, (STAGE_SECONDS, CYCLES, PAYLOAD_BYTES))
+    stop = heartbeat.stop if heartbeat is not None else threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    cycle.start()
+    while not stop.is_set():
+        started = time.monotonic()
+        result, new_events = "error", 0
         try:
-            df = getChanges(concept_df)
-            data = df.where(pd.notnull(df), None).to_dict(orient="records")
-            queue.put(data)
-            change_buffer.append(df)
+            result, new_events = cycle.handle(getChanges(concept_index))
         except Exception as e:
             print(f"[get_changes_worker_queue] getChanges错误: {e}")
-        now = time.time()
-        if len(change_buffer) >= batch_size or (now - last_write) >= batch_interval:
-            if change_buffer:
-                try:
-                    all_df = pd.concat(change_buffer, ignore_index=True)
-                    all_df.to_csv(changes_path, index=False)
-                    print(f"[get_changes_worker_queue] 批量写入 {len(change_buffer)} 条变更到 {changes_path}")
-                    change_buffer.clear()
-                    last_write = now
-                except Exception as e:
-                    print(f"[get_changes_worker_queue] 批量写入失败: {e}")
-        time.sleep(interval)
+        delay = cycle.finish(result, time.monotonic() - started, new_events)
+        if exporter is not None:
+            exporter.maybe_push()
+        stop.wait(delay)
+    cycle.close()
+    # API 进程可能已经不再读取 queue，退出时不等待未送出的消息，磁盘上的数据已经完整
+    queue.cancel_join_thread()
+    print("[get_changes_worker_queue] 收到停止信号，已落盘并退出", flush=True)
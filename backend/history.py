@@ -0,0 +1,289 @@
+"""多日历史存储：每个交易日一个异动事件分区和一个上涨板块排名分区，格式由 storage 决定（有 pyarrow 时为 Arrow）
+
+    python history.py backfill [--from YYYYMMDD] [--to YYYYMMDD] [--static static]
+
+backfill 按 calendar.json 逐个交易日检查，把 static/events 下的当日事件日志和上涨板块排名整理成分区；
+分区缺失或早于事件日志时重写。上游接口只提供当天的异动，没有本地事件日志的交易日无法补齐，会列为 unavailable。
+"""
+import argparse
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+import storage
+from concept_heat import HEAT_FIELDS
+from event_log import day_path, event_minute, logged_days, read_day, read_rising
+from scheduler import AFTERNOON_CLOSE, BEIJING, CLOSE_GRACE, TradingCalendar
+
+EVENT_COLUMNS = ['时间排序', '上下午', '板块名称', '股票代码', '名称', '类型', '四舍五入取整', '相关信息']
+RISING_COLUMNS = ['名次', '板块代码', '板块名称']
+# 聚合查询用到的事件列
+SCAN_COLUMNS = ['板块名称', '股票代码', '类型', '四舍五入取整']
+# 取值重复度高的文本列按分类存储（Arrow 中为字典编码），文件更小，聚合时按整数编码分组
+CATEGORY_COLUMNS = ['上下午', '板块名称', '股票代码', '名称', '类型']
+TYPE_FIELDS = ("events", "up", "down", "magnitude", "stocks", "concepts", "days")
+LIMIT_TYPE = "封涨停板"
+# 分组数 × 取值数不超过该值时用标记数组统计不同取值数，否则排序去重
+DENSE_DISTINCT_LIMIT = 1 << 26
+
+
+def parse_day(value: str) -> date:
+    if not (isinstance(value, str) and len(value) == 8 and value.isdigit()):
+        raise ValueError(f"Invalid date '{value}', expected YYYYMMDD")
+    return date(int(value[:4]), int(value[4:6]), int(value[6:]))
+
+
+class HistoryStore:
+    """按日分区的历史表：directory/events/YYYYMMDD、directory/rising/YYYYMMDD
+
+    过去的分区不再变化，读出后按文件修改时间缓存为 numpy 数组，文本列编码为整个存储共用的整数；
+    查询只需拼接数组，再用 bincount 分组计数，不逐行处理。
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._cache = {}  # (分区类型, 交易日) → ((路径, 修改时间), 转换后的分区)
+        self._names = {}  # 列名 → 按编码排列的取值（pandas Index），所有分区共用
+        self._lock = threading.Lock()
+
+    def _base(self, kind: str, day: str) -> str:
+        return os.path.join(self.directory, kind, day)
+
+    def days(self, kind: str = "events", start: str = None, end: str = None) -> list:
+        """已有分区的交易日，升序，可按 [start, end] 过滤"""
+        try:
+            names = os.listdir(os.path.join(self.directory, kind))
+        except FileNotFoundError:
+            return []
+        days = sorted({
+            name[:8] for name in names
+            if name[:8].isdigit() and not name.endswith(".tmp") and name[8:] in {s.suffix for s in storage.STORES.values()}
+        })
+        return [d for d in days if (start is None or d >= start) and (end is None or d <= end)]
+
+    def mtime(self, kind: str, day: str):
+        path, _ = storage.find_table(self._base(kind, day))
+        return None if path is None else os.path.getmtime(path)
+
+    def write_day(self, day: str, rows: list, ranking: list) -> None:
+        """写入一个交易日的事件（EventLog 记录的行）和最后的上涨板块排名"""
+        import pandas as pd
+        os.makedirs(os.path.join(self.directory, "events"), exist_ok=True)
+        events = pd.DataFrame.from_records(rows, columns=EVENT_COLUMNS)
+        events['时间排序'] = [event_minute(row) for row in rows]
+        events['四舍五入取整'] = pd.to_numeric(events['四舍五入取整'], errors='coerce')
+        events[CATEGORY_COLUMNS] = events[CATEGORY_COLUMNS].astype('category')
+        storage.write_table(self._base("events", day), events)
+        if ranking:
+            os.makedirs(os.path.join(self.directory, "rising"), exist_ok=True)
+            rising = pd.DataFrame({
+                '名次': range(1, len(ranking) + 1),
+                '板块代码': [item.get('板块代码') for item in ranking],
+                '板块名称': [item.get('板块名称') for item in ranking],
+            })
+            storage.write_table(self._base("rising", day), rising)
+
+    def _read(self, kind: str, day: str, columns, convert):
+        """读取一个分区的 columns 列并用 convert 转换，文件未变化时返回缓存的转换结果"""
+        path, store = storage.find_table(self._base(kind, day))
+        if path is None:
+            raise FileNotFoundError(self._base(kind, day))
+        key = (path, os.path.getmtime(path))
+        with self._lock:
+            cached = self._cache.get((kind, day))
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            value = convert(store.read_frame(path, columns))
+            self._cache[(kind, day)] = (key, value)
+        return value
+
+    def _encode(self, column: str, series):
+        """文本列转为整个存储内一致的整数编码，空值为 -1"""
+        import numpy as np
+        import pandas as pd
+        if not isinstance(series.dtype, pd.CategoricalDtype):
+            series = series.astype('category')
+        categories = series.cat.categories
+        names = self._names.get(column)
+        if names is None:
+            names = self._names[column] = pd.Index([], dtype=categories.dtype)
+        mapping = names.get_indexer(categories)
+        unseen = mapping < 0
+        if unseen.any():
+            mapping[unseen] = np.arange(len(names), len(names) + unseen.sum())
+            self._names[column] = names.append(categories[unseen])
+        # 末尾的 -1 让空值（分类编码 -1）映射为 -1
+        return np.append(mapping, -1).astype(np.int64)[series.cat.codes.to_numpy()]
+
+    def _event_columns(self, df) -> dict:
+        import numpy as np
+        import pandas as pd
+        columns = {column: self._encode(column, df[column]) for column in SCAN_COLUMNS[:3]}
+        columns['四舍五入取整'] = pd.to_numeric(df['四舍五入取整'], errors='coerce').fillna(0).to_numpy(np.float64)
+        return columns
+
+    def scan_events(self, start: str = None, end: str = None):
+        """[start, end] 内所有事件分区的列拼接成 numpy 数组（文本列为整数编码，日期 为分区序号），没有分区时返回 None"""
+        import numpy as np
+        days = self.days("events", start, end)
+        parts = [self._read("events", day, SCAN_COLUMNS, self._event_columns) for day in days]
+        if not parts:
+            return None
+        data = {column: np.concatenate([part[column] for part in parts]) for column in parts[0]}
+        data['日期'] = np.repeat(np.arange(len(parts)), [len(part['类型']) for part in parts])
+        return data
+
+    def _aggregate(self, key: str, start, end, distinct):
+        """按 key 列分组：事件数、上涨/下跌/封涨停板事件数、magnitude、heat，以及 distinct 中各列的不同取值数"""
+        import numpy as np
+        import pandas as pd
+        data = self.scan_events(start, end)
+        if data is None:
+            return None
+        valid = data[key] >= 0
+        data = {column: values[valid] for column, values in data.items()}
+        groups = data[key]
+        names = self._names[key]
+        n = len(names)
+        value = data['四舍五入取整']
+        # 没有该类型时用 -2，避免与空值的 -1 相等
+        limit_code = self._names['类型'].get_loc(LIMIT_TYPE) if LIMIT_TYPE in self._names['类型'] else -2
+        stats = pd.DataFrame({
+            'events': np.bincount(groups, minlength=n),
+            'up': np.bincount(groups, minlength=n, weights=value > 0),
+            'down': np.bincount(groups, minlength=n, weights=value < 0),
+            'limit_up': np.bincount(groups, minlength=n, weights=data['类型'] == limit_code),
+            'magnitude': np.bincount(groups, minlength=n, weights=np.abs(value)),
+            'heat': np.bincount(groups, minlength=n, weights=value),
+        }, index=names.rename('name'))
+        for field, column in distinct.items():
+            other = data[column]
+            known = other >= 0
+            # (分组, 取值) 组合成一个整数，标记出现过的组合后按分组计数
+            width = int(other.max()) + 1 if known.any() else 1
+            pairs = groups[known] * width + other[known]
+            if n * width <= DENSE_DISTINCT_LIMIT:
+                seen = np.zeros(n * width, dtype=bool)
+                seen[pairs] = True
+                stats[field] = seen.reshape(n, width).sum(axis=1)
+            else:
+                stats[field] = np.bincount(np.unique(pairs) // width, minlength=n)
+        return stats[stats['events'] > 0]
+
+    @staticmethod
+    def _records(stats, sort, limit):
+        stats = stats.sort_values([sort, 'events'], ascending=False, kind='stable')
+        if limit is not None:
+            stats = stats.head(limit)
+        stats = stats.reset_index()
+        for column in stats.columns:
+            if column != 'name' and stats[column].dtype.kind == 'f' and (stats[column] % 1 == 0).all():
+                stats[column] = stats[column].astype('int64')
+        return stats.to_dict(orient='records')
+
+    def concept_stats(self, start: str = None, end: str = None, sort: str = "heat", limit: int = None) -> list:
+        """按板块名称汇总区间内的事件，字段与当日的 /api/concepts/heat 相同，另有 days（出现异动的天数）"""
+        if sort not in HEAT_FIELDS + ("days",):
+            raise ValueError(f"sort must be one of {HEAT_FIELDS + ('days',)}")
+        stats = self._aggregate('板块名称', start, end, {'stocks': '股票代码', 'days': '日期'})
+        if stats is None:
+            return []
+        return self._records(stats[list(HEAT_FIELDS) + ['days']], sort, limit)
+
+    def type_stats(self, start: str = None, end: str = None, sort: str = "events", limit: int = None) -> list:
+        """按异动类型汇总区间内的事件：事件数、上涨/下跌数、magnitude、涉及股票数、板块数和天数"""
+        if sort not in TYPE_FIELDS:
+            raise ValueError(f"sort must be one of {TYPE_FIELDS}")
+        stats = self._aggregate('类型', start, end, {'stocks': '股票代码', 'concepts': '板块名称', 'days': '日期'})
+        if stats is None:
+            return []
+        return self._records(stats[list(TYPE_FIELDS)], sort, limit)
+
+    @staticmethod
+    def _rising_frame(df):
+        return df.astype({'板块代码': object, '板块名称': object})
+
+    def rising_stats(self, start: str = None, end: str = None, limit: int = None) -> list:
+        """按板块代码汇总区间内每日收盘时的上涨板块排名：上榜天数、最好名次和平均名次"""
+        import pandas as pd
+        days = self.days("rising", start, end)
+        if not days:
+            return []
+        frames = [self._read("rising", day, RISING_COLUMNS, self._rising_frame).assign(日期=day) for day in days]
+        df = pd.concat(frames, ignore_index=True)
+        grouped = df.groupby('板块代码', sort=False)
+        stats = grouped.agg(
+            name=('板块名称', 'first'), days=('日期', 'nunique'), best_rank=('名次', 'min'), avg_rank=('名次', 'mean'),
+        )
+        stats['avg_rank'] = stats['avg_rank'].round(2)
+        stats = stats.sort_values(['days', 'avg_rank'], ascending=[False, True], kind='stable')
+        if limit is not None:
+            stats = stats.head(limit)
+        stats = stats.rename_axis('code').reset_index()
+        stats['name'] = stats['name'].astype(object).where(stats['name'].notna(), None)
+        return stats.to_dict(orient='records')
+
+
+def default_end(calendar: TradingCalendar, now: datetime = None) -> date:
+    """最近一个已经收盘的日子：收盘（含宽限）之后为今天，否则为昨天"""
+    now = now or datetime.now(BEIJING)
+    close = (datetime.combine(now.date(), AFTERNOON_CLOSE) + CLOSE_GRACE).time()
+    today = now.date()
+    return today if now.time() >= close else today - timedelta(days=1)
+
+
+def backfill(history_dir: str, events_dir: str, calendar: TradingCalendar, start: date = None, end: date = None,
+             now: datetime = None) -> dict:
+    """把 [start, end] 内缺失或过期的交易日从事件日志整理为分区，返回写入和无法补齐的交易日。
+    start 默认为最早的事件日志，end 默认为最近一个已收盘的日子"""
+    store = HistoryStore(history_dir)
+    end = end or default_end(calendar, now)
+    if start is None:
+        logged = logged_days(events_dir)
+        if not logged:
+            return {"written": [], "unavailable": []}
+        start = parse_day(logged[0])
+    written, unavailable = [], []
+    for day in calendar.trading_days(start, end):
+        key = day.strftime('%Y%m%d')
+        log_path = day_path(events_dir, key)
+        if not os.path.exists(log_path):
+            if store.mtime("events", key) is None:
+                unavailable.append(key)
+            continue
+        stored = store.mtime("events", key)
+        if stored is not None and stored >= os.path.getmtime(log_path):
+            continue
+        store.write_day(key, read_day(events_dir, key), read_rising(events_dir, key))
+        written.append(key)
+    return {"written": written, "unavailable": unavailable}
+
+
+def archive(static_dir: str, calendar: TradingCalendar) -> dict:
+    """采集进程启动和收盘后调用：把 static/events 中已收盘的交易日整理进 static/history"""
+    result = backfill(os.path.join(static_dir, "history"), os.path.join(static_dir, "events"), calendar)
+    if result["written"]:
+        print(f"[history] 写入 {len(result['written'])} 个交易日: {', '.join(result['written'])}", flush=True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('backfill',))
+    parser.add_argument('--from', dest='start', help='first trading day (YYYYMMDD), default: earliest event log')
+    parser.add_argument('--to', dest='end', help='last trading day (YYYYMMDD), default: last closed day')
+    parser.add_argument('--static', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+    parser.add_argument('--calendar', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                           'akshare', 'file_fold', 'calendar.json'))
+    args = parser.parse_args()
+
+    result = backfill(
+        os.path.join(args.static, 'history'), os.path.join(args.static, 'events'), TradingCalendar.load(args.calendar),
+        start=parse_day(args.start) if args.start else None, end=parse_day(args.end) if args.end else None,
+    )
+    print(f"written: {', '.join(result['written']) or 'none'}")
+    print(f"unavailable (no local event log): {', '.join(result['unavailable']) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# (连接超时, 读取超时)，单位秒
+DEFAULT_TIMEOUT = (3.05, 5)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.3
+
+_session = None
+_executor = None
+_lock = threading.Lock()
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """未显式传入 timeout 时使用默认超时，避免网络卡住整个轮询周期"""
+
+    def __init__(self, *args, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def get_session() -> requests.Session:
+    """进程内共享的 Session：连接池 + keep-alive + 超时 + 指数退避重试"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                retry = Retry(
+                    total=RETRY_TOTAL,
+                    backoff_factor=RETRY_BACKOFF,
+                    status_forcelist=RETRY_STATUSES,
+                    allowed_methods=frozenset(["GET"]),
+                )
+                adapter = TimeoutHTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """并发请求用的线程池，大小与连接池一致"""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="http")
+    return _executor
+
+
+class AsyncHTTPClient:
+    """事件循环中使用的 HTTP 客户端，get 返回响应体字节
+
+    安装了 httpx 时使用 httpx.AsyncClient，连接池、超时和重试与 get_session 一致；
+    没有 httpx 时在 get_executor 线程池中调用共享的 Session，同样不阻塞事件循环，只是每个请求占用一个线程。
+    """
+
+    def __init__(self):
+        try:
+            import httpx
+        except ImportError:
+            httpx = None
+        self._client = None
+        if httpx is not None:
+            connect, read = DEFAULT_TIMEOUT
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read, connect=connect),
+                # transport 的 retries 只重试连接失败，状态码由 get 重试
+                transport=httpx.AsyncHTTPTransport(
+                    retries=RETRY_TOTAL,
+                    limits=httpx.Limits(max_connections=8, max_keepalive_connections=4),
+                ),
+            )
+
+    @property
+    def backend(self):
+        return "requests" if self._client is None else "httpx"
+
+    async def get(self, url, params=None, headers=None) -> bytes:
+        if self._client is None:
+            request = partial(get_session().get, url, params=params, headers=headers)
+            response = await asyncio.get_running_loop().run_in_executor(get_executor(), request)
+            return response.content
+        for attempt in range(RETRY_TOTAL + 1):
+            response = await self._client.get(url, params=params, headers=headers)
+            if response.status_code not in RETRY_STATUSES or attempt == RETRY_TOTAL:
+                break
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+        return response.content
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime
+
+
+class LogClient:
+    """单个 /ws/logs 客户端的有界发送队列，跟不上时丢弃最旧的帧"""
+
+    def __init__(self, maxsize=50):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, frame):
+        while self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                break
+        self.queue.put_nowait(frame)
+
+
+class LogHub:
+    """子进程输出的广播管道
+
+    读取线程调用 push 把行放进带锁的缓冲区，只在缓冲区由空变为非空时唤醒一次事件循环；
+    事件循环上唯一的 pump 任务每 interval 秒把积累的行合并成一帧（按换行分隔）发给所有客户端。
+    """
+
+    def __init__(self, history=1000, interval=0.1, client_queue_size=50):
+        self.history = deque(maxlen=history)
+        self.interval = interval
+        self.client_queue_size = client_queue_size
+        self.clients = set()
+        self.dropped = 0  # 已断开客户端累计丢弃的帧数
+        self._pending = []
+        self._lock = threading.Lock()
+        self._loop = None
+        self._wakeup = None
+
+    def bind(self, loop):
+        """绑定到服务器事件循环，之前积累的行会在第一个周期发出"""
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        with self._lock:
+            if self._pending:
+                self._wakeup.set()
+
+    def push(self, message):
+        """线程安全：可以在任何线程调用"""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            wake = not self._pending
+            self._pending.append(f"[{timestamp}] {message}")
+        if wake and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def subscribe(self):
+        client = LogClient(self.client_queue_size)
+        self.clients.add(client)
+        return client
+
+    def unsubscribe(self, client):
+        if client in self.clients:
+            self.clients.discard(client)
+            self.dropped += client.dropped
+
+    def dropped_total(self):
+        return self.dropped + sum(client.dropped for client in self.clients)
+
+    def history_frame(self):
+        return "\n".join(self.history)
+
+    async def pump(self):
+        while True:
+            await self._wakeup.wait()
+            # 等待一个批次窗口，把这段时间内的所有行合并成一帧
+            await asyncio.sleep(self.interval)
+            self._wakeup.clear()
+            with self._lock:
+                lines, self._pending = self._pending, []
+            if not lines:
+                continue
+            self.history.extend(lines)
+            frame = "\n".join(lines)
+            for client in self.clients:
+                client.offer(frame)
@@ -1,53 +1,321 @@
 import os
 import sys
 import asyncio
+import importlib
+import queue
 import threading
-from fastapi import FastAPI, WebSocket, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query, Request, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from uvicorn import Config, Server
 import subprocess
-import pandas as pd
-from collections import deque
 from datetime import datetime
 from multiprocessing import Process, Queue
+from changes_hub import ChangeFilter, ChangesHub
+from log_hub import LogHub
+import fastjson
+import storage
+from shm_transport import SnapshotRing
+from supervisor import ManagedWorker, Supervisor
+from concept_heat import ConceptHeat
+from concept_index import ConceptIndex
+from event_log import EventIndex, parse_hhmm, read_day, trading_day
+import metrics
+from frontend_assets import FrontendManifest
+import history
+from scheduler import TradingCalendar
 
 # 主进程与子进程共享的队列
 buffer_queue = Queue(maxsize=200)
+metrics_queue = Queue(maxsize=1)  # changes worker 定期放入本进程的指标文本
 
 PORT_API = 61125
+FRONTEND_DIST = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "dist"))
+# changes 的采集方式：process 为受监管的 worker 进程（默认），async 为 API 进程事件循环中的任务
+INGEST_MODE = os.environ.get("SIDECAR_INGEST", "process")
 
 # Global variables
 server_instance = None  # Global reference to the Uvicorn server instance
-concept_df = None  # Global variable for concepts data
-log_messages = deque(maxlen=1000)  # Store last 1000 log messages
-active_websockets = set()  # Store active WebSocket connections
+snapshot_ring = None  # 与 changes worker 共享的快照环形缓冲区
+async_ingest_options = None  # async 模式下 AsyncIngestor 的参数，由 lifespan 启动
+ingestor = None  # async 模式下正在运行的 AsyncIngestor
+frontend_manifest = None  # dist 目录的内存清单，lifespan 中在线程里构建
+log_hub = LogHub(history=1000)  # 子进程日志的广播管道，保留最近1000条
+changes_hub = ChangesHub(maxsize=2)  # /ws/changes 的广播中心
+event_index = EventIndex()  # 当日事件的时间索引，供 /api/changes 查询
+history_store = None  # 多日历史分区，第一次查询时创建
+concept_heat = ConceptHeat()  # 当日板块热度，由新增事件增量更新
+changes_file_signature = None  # 当前快照来自磁盘文件时记录文件的 (路径, inode, mtime, size)
+concept_names_cache = (None, {})  # (concepts 文件签名, 板块代码 → 板块名称)，订阅时才加载
+metrics_collector = metrics.Collector(metrics_queue)
+
+# API 进程的指标；worker 进程的各阶段耗时由 metrics_queue 带回
+API_STAGE_SECONDS = metrics.histogram(
+    "sidecar_api_stage_seconds", "Time spent ingesting worker snapshots in the API process", ("stage",)
+)
+SNAPSHOTS_COALESCED = metrics.counter(
+    "sidecar_snapshots_coalesced_total", "Worker snapshots skipped because a newer one was already queued"
+)
+WS_SEND_SECONDS = metrics.histogram("sidecar_ws_send_seconds", "Time spent sending one WebSocket frame", ("channel",))
+WS_FRAMES = metrics.counter("sidecar_ws_frames_total", "WebSocket frames sent", ("channel",))
+metrics.gauge("sidecar_buffer_queue_depth", "Messages waiting in the worker snapshot queue").set_function(
+    buffer_queue.qsize  # macOS 上 qsize 不可用，抓取时跳过
+)
+WS_CLIENTS = metrics.gauge("sidecar_ws_clients", "Connected WebSocket clients", ("channel",))
+WS_DROPPED = metrics.counter_function(
+    "sidecar_ws_dropped_frames_total", "Frames dropped for WebSocket clients that fell behind", ("channel",)
+)
+WS_CLIENTS.set_function(lambda: len(changes_hub.subscribers), "changes")
+WS_CLIENTS.set_function(lambda: len(log_hub.clients), "logs")
+WS_CLIENTS.set_function(lambda: len(concept_heat.clients), "concepts_heat")
+WS_DROPPED.set_function(changes_hub.dropped_total, "changes")
+WS_DROPPED.set_function(log_hub.dropped_total, "logs")
+WS_DROPPED.set_function(lambda: concept_heat.dropped, "concepts_heat")
+
+
+async def send_frame(websocket, channel, data, binary=False):
+    """发送一帧并记录耗时"""
+    start = time.perf_counter()
+    if binary:
+        await websocket.send_bytes(data)
+    else:
+        await websocket.send_text(data)
+    WS_SEND_SECONDS.observe(time.perf_counter() - start, channel)
+    WS_FRAMES.inc(1, channel)
+
+
+def read_snapshot_message(message):
+    """把 worker 的队列消息还原为快照字节，共享内存槽位已被覆盖时返回 None"""
+    kind = message[0]
+    if kind == "shm":
+        if snapshot_ring is None:
+            return None
+        return snapshot_ring.read(message[1], message[2])
+    return message[1]
+
+
+def buffer_queue_reader(loop):
+    """阻塞读取 buffer_queue 的线程，收到快照立即通知事件循环广播，空闲时不占用任何唤醒"""
+    while True:
+        try:
+            message = buffer_queue.get()
+            if message is None:  # 退出信号
+                break
+            # 积压时只处理最新的快照；事件消息只包含增量，每条都要处理
+            snapshot, stop = None, False
+            while True:
+                if message[0] == "events":
+                    loop.call_soon_threadsafe(publish_worker_events, fastjson.loads(message[1]))
+                else:
+                    if snapshot is not None:
+                        SNAPSHOTS_COALESCED.inc()
+                    snapshot = message
+                try:
+                    message = buffer_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if message is None:
+                    stop = True
+                    break
+            if snapshot is not None:
+                with API_STAGE_SECONDS.time("read"):
+                    payload = read_snapshot_message(snapshot)
+                if payload is not None:
+                    # 在读取线程解码，事件循环只做广播
+                    with API_STAGE_SECONDS.time("decode"):
+                        rows = fastjson.loads(payload)
+                    loop.call_soon_threadsafe(publish_worker_snapshot, rows, payload)
+            if stop:
+                break
+        except Exception as e:
+            print(f"[ws/changes] 读取 buffer_queue 错误: {e}")
+
+
+def publish_worker_snapshot(rows, payload=None):
+    """发布 worker 推送的快照，之后不再需要检查磁盘上的 changes 文件"""
+    global changes_file_signature
+    changes_file_signature = None
+    with API_STAGE_SECONDS.time("publish"):
+        changes_hub.publish(rows, payload)
+
+
+def publish_worker_events(rows):
+    """把新写入事件日志的事件加入当日索引；快照按名称+类型去重过，索引只从这里更新"""
+    with API_STAGE_SECONDS.time("index"):
+        day = trading_day()
+        if concept_heat.add(event_index.add(rows, day), day):
+            concept_heat.broadcast()
+
+
+def latest_changes_snapshot():
+    """返回内存中的最新快照；还没有 worker 数据时读取磁盘上的 changes 文件，文件未变化则直接复用"""
+    global changes_file_signature
+    snapshot = changes_hub.latest
+    if snapshot is not None and changes_file_signature is None:
+        return snapshot
+    path, _ = storage.find_table(static_table_path("changes"))
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
+        return snapshot
+    signature = (path, st.st_ino, st.st_mtime_ns, st.st_size)
+    if snapshot is None or signature != changes_file_signature:
+        rows = read_changes_rows()
+        changes_file_signature = signature
+        snapshot = changes_hub.publish(rows)
+    return snapshot
+
+
+def concept_names_by_code():
+    """板块代码 → 板块名称，concepts 表变化后重新加载；会读文件，在线程中调用"""
+    global concept_names_cache
+    path, _ = storage.find_table(static_table_path("concepts"))
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):
+        return concept_names_cache[1]
+    signature = (path, st.st_ino, st.st_mtime_ns, st.st_size)
+    if signature != concept_names_cache[0]:
+        try:
+            index = ConceptIndex.from_frame(storage.read_frame(static_table_path("concepts")))
+        except Exception as e:
+            print(f"[ws/changes] 读取 concepts 文件错误: {e}")
+            return concept_names_cache[1]
+        concept_names_cache = (signature, dict(zip(index.concept_codes, index.concept_names)))
+    return concept_names_cache[1]
+
+
+async def restore_today_events():
+    """从事件日志恢复当日事件，重启后查询接口也能拿到完整数据；在端口打开后于线程中读取"""
+    today = trading_day()
+    rows = await asyncio.to_thread(read_day, static_table_path("events"), today)
+    # 与 worker 推送的快照重叠的事件由 EventIndex 去重
+    if concept_heat.add(event_index.add(rows, today), today):
+        concept_heat.broadcast()
+
+
+def run_changes_worker(*args, **kwargs):
+    """changes worker 进程的入口，pandas 等重依赖只在 worker 进程里导入"""
+    from get_changes_worker_queue import worker
+    worker(*args, **kwargs)
+
+
+async def run_async_ingestor():
+    """async 模式的采集任务；pandas 等重依赖在线程中导入，不推迟端口打开"""
+    global ingestor
+    module = await asyncio.to_thread(importlib.import_module, "async_ingest")
+    ingestor = module.AsyncIngestor(
+        publish=publish_worker_snapshot, publish_events=publish_worker_events, **async_ingest_options
+    )
+    await ingestor.run()
+
+
+def start_changes_ingestion(mode=None, static_dir=None):
+    """按 mode（默认 SIDECAR_INGEST）准备 changes 采集。
+    process：由 supervisor 管理 worker 进程，快照经共享内存传回，板块表由 worker 自己读取；
+    async：服务器启动后 lifespan 在事件循环中运行 AsyncIngestor，结果直接进入广播。
+    static_dir 为读取 concepts、写入 changes 和事件日志的目录，默认为 static 目录"""
+    global snapshot_ring, async_ingest_options
+    mode = mode or INGEST_MODE
+    concept_source = os.path.join(static_dir, "concepts") if static_dir else static_table_path("concepts")
+    if mode == "async":
+        async_ingest_options = {"concept_source": concept_source, "interval": 2, "static_dir": static_dir}
+        return
+    if mode != "process":
+        raise ValueError(f"Unsupported ingest mode: {mode}")
+    snapshot_ring = SnapshotRing.create()
+
+    def spawn_changes_worker(heartbeat):
+        proc = Process(
+            target=run_changes_worker,
+            args=(concept_source, buffer_queue, 2),
+            kwargs={"shm_name": snapshot_ring.name, "heartbeat": heartbeat, "metrics_queue": metrics_queue,
+                    "static_dir": static_dir},
+            daemon=True,
+        )
+        proc.start()
+        return proc
+
+    supervisor.add(ManagedWorker("getChanges", spawn_changes_worker))
+
+
+def load_frontend_manifest():
+    """返回构建 dist 清单的任务，只构建一次；读文件和压缩在线程中进行，不推迟端口打开"""
+    global frontend_manifest
+    if frontend_manifest is None:
+        frontend_manifest = asyncio.create_task(asyncio.to_thread(FrontendManifest.build, FRONTEND_DIST))
+    return frontend_manifest
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    restore_events = asyncio.create_task(restore_today_events())
+    reader = threading.Thread(
+        target=buffer_queue_reader, args=(asyncio.get_running_loop(),), daemon=True
+    )
+    reader.start()
+    log_hub.bind(asyncio.get_running_loop())
+    log_pump = asyncio.create_task(log_hub.pump())
+    ingest = asyncio.create_task(run_async_ingestor()) if async_ingest_options is not None else None
+    load_frontend_manifest()
+    yield
+    restore_events.cancel()
+    log_pump.cancel()
+    if ingest is not None:
+        ingest.cancel()
+        await asyncio.gather(ingest, return_exceptions=True)
+    buffer_queue.put(None)
 
 
 app = FastAPI(
     title="API server",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
-# getConcepts 子进程管理
-get_concepts_proc = None
-# getChanges 子进程管理
-get_changes_proc = None
-get_changes_timer = None
-get_changes_stop_event = threading.Event()
+# 子进程监管：getChanges worker 按心跳监控并自动重启，getConcepts 失败时重试
+supervisor = Supervisor()
+SHUTDOWN_TIMEOUT = 10  # sidecar shutdown 后等待服务器退出的最长秒数
+
+
+def get_concepts_worker():
+    worker = supervisor.get("getConcepts")
+    if worker is None:
+        worker = supervisor.add(
+            ManagedWorker("getConcepts", lambda heartbeat: spawn_get_concepts(), heartbeat=False,
+                          restart="on-failure", backoff_min=30.0, max_restarts=3),
+            start=False,
+        )
+    return worker
+
 
 @app.post("/api/start_get_concepts")
 def start_get_concepts():
-    global get_concepts_proc
+    worker = get_concepts_worker()
     # 检查子进程是否正在运行
-    if get_concepts_proc is not None and get_concepts_proc.poll() is None:
-        return {"status": "already running", "pid": get_concepts_proc.pid}
-    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    if worker.is_running():
+        return {"status": "already running", "pid": worker.proc.pid}
     # 启动子进程执行 getConcepts
-    get_concepts_proc = subprocess.Popen([
-        sys.executable, "-c", "from concepts import getConcepts; getConcepts()"
-    ], cwd=backend_dir)
-    return {"status": "started", "pid": get_concepts_proc.pid}
+    worker.start()
+    return {"status": "started", "pid": worker.proc.pid}
+
+
+def spawn_get_concepts():
+    """以子进程执行 getConcepts，输出经读取线程送入 /ws/logs"""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.Popen(
+        [sys.executable, "-c", "from concepts import getConcepts; getConcepts()"],
+        cwd=backend_dir,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+        env={**os.environ, "PYTHONUNBUFFERED": "1"},
+    )
+    threading.Thread(target=output_reader, args=(proc.stdout, "getConcepts"), daemon=True).start()
+    return proc
 
 
 # 允许本地开发端口 1420 和 1430 跨域访问
@@ -71,39 +339,68 @@ app.add_middleware(
 )
 
 @app.websocket("/ws/changes")
-async def websocket_changes(websocket: WebSocket):
+async def websocket_changes(
+    websocket: WebSocket, mode: str = "full", fmt: str = Query("json", alias="format")
+):
+    """推送变更列表。mode=full 每次推送整张列表；mode=delta 推送带 seq 的增量，
+    客户端发送 {"action": "resync"} 可重新获取完整快照。
+    format=json/columns/msgpack，msgpack 以二进制帧发送。
+    客户端发送 {"action": "subscribe", "concepts": [...], "types": [...], "min_change": 5, "session": "上午"}
+    后只推送满足条件的行（concepts 可用板块代码或名称，省略的条件不限制，不带条件即取消过滤）"""
+    if fmt not in fastjson.supported_formats():
+        await websocket.close(code=1003, reason=f"Unsupported format: {fmt}")
+        return
     print(f"[ws/changes] New WebSocket connection from {websocket.client}")
     await websocket.accept()
-    import json
-    try:
+    subscriber = changes_hub.subscribe("delta" if mode == "delta" else "full", fmt)
+
+    async def send_frames():
+        # 新连接先补发最近一次快照，还没有快照时降级为读csv
+        snapshot = latest_changes_snapshot()
+        if subscriber.queue.empty():
+            # 没有任何数据时只给这个连接发空列表，/api/changes/json 仍返回 404，之后的连接还会检查文件
+            subscriber.offer(snapshot if snapshot is not None else changes_hub.empty_snapshot())
         while True:
-            # 优先从缓冲队列读取
-            sent = False
+            snapshot = await subscriber.queue.get()
+            data, binary = subscriber.render(snapshot)
+            await send_frame(websocket, "changes", data, binary)
+
+    async def receive_commands():
+        while True:
+            message = await websocket.receive_text()
             try:
-                while not buffer_queue.empty():
-                    data = buffer_queue.get_nowait()
-                    await websocket.send_text(json.dumps(data, ensure_ascii=False))
-                    sent = True
-            except Exception as e:
-                await websocket.send_text(json.dumps({"error": str(e)}, ensure_ascii=False))
-            # 如果队列为空，降级为读csv
-            if not sent:
+                command = fastjson.loads(message)
+            except ValueError:
+                continue
+            if not isinstance(command, dict):
+                continue
+            action = command.get("action")
+            if action == "resync":
+                subscriber.request_resync(changes_hub.latest)
+            elif action == "subscribe":
+                # 首次订阅要读 concepts 表并导入 pandas，放到线程中，不阻塞其他连接的推送
+                names = await asyncio.to_thread(concept_names_by_code)
                 try:
-                    csv_path = get_resource_path("static/changes.csv")
-                    if not csv_path or not os.path.exists(csv_path):
-                        await websocket.send_text("[]")
-                    else:
-                        import pandas as pd
-                        df = pd.read_csv(csv_path)
-                        data = df.where(pd.notnull(df), None).to_dict(orient="records")
-                        await websocket.send_text(json.dumps(data, ensure_ascii=False))
-                except Exception as e:
-                    await websocket.send_text(json.dumps({"error": str(e)}, ensure_ascii=False))
-            await asyncio.sleep(2)
+                    flt = ChangeFilter.from_message(command, names.get)
+                except ValueError as e:
+                    print(f"[ws/changes] 无效的订阅条件: {e}")
+                    continue
+                subscriber.set_filter(flt, changes_hub.latest)
+
+    tasks = [asyncio.create_task(send_frames()), asyncio.create_task(receive_commands())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
 
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
         print(f"[ws/changes] WebSocket error: {e}")
     finally:
+        for task in tasks:
+            task.cancel()
+        changes_hub.unsubscribe(subscriber)
         print(f"[ws/changes] WebSocket connection closed: {websocket.client}")
         try:
             await websocket.close()
@@ -111,100 +408,274 @@ async def websocket_changes(websocket: WebSocket):
             print(f"[ws/changes] WebSocket already closed: {e}")
 
 
+# CSV 格式的 changes 表中需要还原为数字的列，其余列保持字符串
+CHANGES_NUMERIC_COLUMNS = ("四舍五入取整", "时间排序")
+
+
+def static_table_path(name):
+    """static 目录下数据表的路径（不含后缀，由 storage 决定格式）"""
+    base_path = getattr(sys, "_MEIPASS", os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_path, "static", name)
+
+
+def read_changes_rows():
+    """读取磁盘上的 changes 表为行列表，读取失败时返回空列表"""
+    try:
+        rows = storage.read_records(static_table_path("changes"))
+    except Exception as e:
+        print(f"[ws/changes] 读取 changes 文件错误: {e}")
+        return []
+    for row in rows:
+        for key in CHANGES_NUMERIC_COLUMNS:
+            # CSV 读出来是字符串，Arrow 已经是数字
+            if isinstance(row.get(key), str):
+                try:
+                    row[key] = int(float(row[key]))
+                except ValueError:
+                    pass
+    return rows
+
+
 @app.websocket("/ws/logs")
 async def websocket_endpoint(websocket: WebSocket):
-    try:
-        print(f"New WebSocket connection attempt from {websocket.client}")
-        await websocket.accept()
-        active_websockets.add(websocket)
-        print(f"WebSocket connection accepted, total active connections: {len(active_websockets)}")
-        # 发送历史日志
-        for message in log_messages:
-            try:
-                await websocket.send_text(message)
-            except Exception as e:
-                print(f"Error sending historical message: {e}")
-                break
-        # 保持连接直到客户端断开
+    """推送子进程日志：连接时先发送一帧历史日志，之后每个批次一帧，多行以换行分隔"""
+    print(f"New WebSocket connection attempt from {websocket.client}")
+    await websocket.accept()
+    client = log_hub.subscribe()
+    print(f"WebSocket connection accepted, total active connections: {len(log_hub.clients)}")
+
+    async def send_frames():
+        if log_hub.history:
+            await send_frame(websocket, "logs", log_hub.history_frame())
         while True:
-            try:
-                await websocket.receive_text()
-                # Optional: send a ping to keep connection alive
-                await websocket.send_text("ping")
-            except Exception as e:
-                print(f"WebSocket connection error: {e}")
-                break
+            await send_frame(websocket, "logs", await client.queue.get())
+
+    async def receive_pings():
+        # 保持连接直到客户端断开，收到消息时回复 ping
+        while True:
+            await websocket.receive_text()
+            client.offer("ping")
+
+    tasks = [asyncio.create_task(send_frames()), asyncio.create_task(receive_pings())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    except WebSocketDisconnect:
+        pass
     except Exception as e:
-        print(f"WebSocket general error: {e}")
+        print(f"WebSocket connection error: {e}")
     finally:
-        active_websockets.remove(websocket)
-        print(f"WebSocket connection closed, remaining active connections: {len(active_websockets)}")
-        print(f"WebSocket connection accepted, total active connections: {len(active_websockets)}")
-        
-        # 发送历史日志
-        for message in log_messages:
-            try:
-                await websocket.send_text(message)
-            except Exception as e:
-                print(f"Error sending historical message: {e}")
-                break
-        
+        for task in tasks:
+            task.cancel()
+        log_hub.unsubscribe(client)
+        print(f"WebSocket connection closed, remaining active connections: {len(log_hub.clients)}")
+
+@app.websocket("/ws/concepts/heat")
+async def websocket_concept_heat(websocket: WebSocket):
+    """推送板块热度表：连接时发送当前热度，之后每次有新事件时发送一帧（只保留最新）"""
+    await websocket.accept()
+    client = concept_heat.subscribe()
+
+    async def send_frames():
+        await send_frame(websocket, "concepts_heat", concept_heat.frame().decode("utf-8"))
+        while True:
+            frame = await client.get()
+            await send_frame(websocket, "concepts_heat", frame.decode("utf-8"))
+
+    async def receive_messages():
         # 保持连接直到客户端断开
         while True:
-            try:
-                await websocket.receive_text()
-                # Optional: send a ping to keep connection alive
-                await websocket.send_text("ping")
-            except Exception as e:
-                print(f"WebSocket connection error: {e}")
-                break
+            await websocket.receive_text()
+
+    tasks = [asyncio.create_task(send_frames()), asyncio.create_task(receive_messages())]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"[ws/concepts/heat] WebSocket error: {e}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        concept_heat.unsubscribe(client)
+
 
 @app.get("/api/watch/status")
 async def get_watch_status():
-    """Get the status of the fluctuation watch process"""
-    global watch_process
-    if watch_process is None:
-        return {"status": "not_running"}
-
-    return_code = watch_process.poll()
-    if return_code is None:
-        return {"status": "running", "pid": watch_process.pid}
-    else:
-        return {"status": "stopped", "return_code": return_code}
+    """Per-worker state, last successful tick, cycle latency, error and restart counts"""
+    workers = supervisor.status()
+    if ingestor is not None:
+        workers["getChanges"] = ingestor.status()
+    return {"workers": workers}
 
 
 @app.get("/api/changes/json")
-async def get_changes_json():
-    """Get changes data in JSON format (from static/changes.csv)"""
+async def get_changes_json(request: Request, fmt: str = Query("json", alias="format")):
+    """Get the latest changes snapshot (format=json/columns/msgpack), honouring If-None-Match"""
+    if fmt not in fastjson.supported_formats():
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {fmt}")
+    snapshot = latest_changes_snapshot()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Changes not found")
+    etag = snapshot.etag if fmt == "json" else f'{snapshot.etag[:-1]}-{fmt}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in candidates or "*" in candidates:
+            return Response(status_code=304, headers=headers)
+    media_type = "application/x-msgpack" if fmt == "msgpack" else "application/json"
+    return Response(content=snapshot.body(fmt), media_type=media_type, headers=headers)
+
+
+def parse_minute_param(value, name):
+    if value is None:
+        return None
     try:
-        csv_path = get_resource_path("static/changes.csv")
-        if not csv_path or not os.path.exists(csv_path):
-            raise HTTPException(status_code=404, detail="Changes not found")
-        df = pd.read_csv(csv_path)
-        data = df.where(pd.notnull(df), None).to_dict(orient="records")
-        return JSONResponse(content=data)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error reading changes.csv: {str(e)}")
+        return parse_hhmm(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid '{name}', expected HH:MM")
+
+
+@app.get("/api/changes")
+async def get_changes(
+    start: str = Query(None, alias="from"),
+    end: str = Query(None, alias="to"),
+    concept: str = None,
+    date: str = None,
+):
+    """Query deduplicated change events by time range (HH:MM) and concept names (comma separated)"""
+    start_minute = parse_minute_param(start, "from")
+    end_minute = parse_minute_param(end, "to")
+    concepts = {name for name in concept.split(",") if name} if concept else None
+    if date is None or date == event_index.day:
+        index = event_index
+    else:
+        if not (date.isdigit() and len(date) == 8):
+            raise HTTPException(status_code=400, detail="Invalid 'date', expected YYYYMMDD")
+        index = EventIndex()
+        # 按分钟偏移表跳过 from 之前的部分
+        index.add(await asyncio.to_thread(read_day, static_table_path("events"), date, start_minute), date)
+    rows = index.query(start_minute, end_minute, concepts)
+    return Response(content=fastjson.dumps(rows), media_type="application/json")
+
+
+@app.get("/api/concepts/heat")
+async def get_concept_heat(sort: str = "heat", limit: int = Query(None, ge=1)):
+    """Ranked per-concept heat for the current trading day (sort by heat/magnitude/events/up/down/limit_up/stocks)"""
+    if sort == "heat" and limit is None:
+        return Response(content=concept_heat.frame(), media_type="application/json")
+    try:
+        document = concept_heat.document(sort, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=fastjson.dumps(document), media_type="application/json")
+
+
+def get_history_store():
+    global history_store
+    if history_store is None:
+        history_store = history.HistoryStore(static_table_path("history"))
+    return history_store
+
+
+def parse_day_param(value, name):
+    if value is None:
+        return None
+    try:
+        history.parse_day(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid '{name}', expected YYYYMMDD")
+    return value
+
+
+async def history_query(method, *args, **kwargs):
+    """历史聚合在线程中运行，第一次查询时才导入 pandas"""
+    try:
+        rows = await asyncio.to_thread(getattr(get_history_store(), method), *args, **kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=fastjson.dumps(rows), media_type="application/json")
+
+
+@app.get("/api/history/days")
+async def get_history_days():
+    """Trading days with a stored history partition"""
+    return {"days": get_history_store().days()}
+
+
+@app.get("/api/history/concepts")
+async def get_history_concepts(
+    start: str = Query(None, alias="from"),
+    end: str = Query(None, alias="to"),
+    sort: str = "heat",
+    limit: int = Query(None, ge=1),
+):
+    """Per-concept totals over a date range (YYYYMMDD), with the /api/concepts/heat fields plus active days"""
+    return await history_query(
+        "concept_stats", parse_day_param(start, "from"), parse_day_param(end, "to"), sort, limit
+    )
+
+
+@app.get("/api/history/types")
+async def get_history_types(
+    start: str = Query(None, alias="from"),
+    end: str = Query(None, alias="to"),
+    sort: str = "events",
+    limit: int = Query(None, ge=1),
+):
+    """Per-type totals over a date range (YYYYMMDD)"""
+    return await history_query("type_stats", parse_day_param(start, "from"), parse_day_param(end, "to"), sort, limit)
+
+
+@app.get("/api/history/rising")
+async def get_history_rising(
+    start: str = Query(None, alias="from"),
+    end: str = Query(None, alias="to"),
+    limit: int = Query(None, ge=1),
+):
+    """Closing rising-concept rankings over a date range (YYYYMMDD): days listed, best and average rank"""
+    return await history_query("rising_stats", parse_day_param(start, "from"), parse_day_param(end, "to"), limit)
+
+
+@app.post("/api/history/backfill")
+async def backfill_history(start: str = Query(None, alias="from"), end: str = Query(None, alias="to")):
+    """Build missing or stale history partitions from the local event logs"""
+    start_day = history.parse_day(parse_day_param(start, "from")) if start else None
+    end_day = history.parse_day(parse_day_param(end, "to")) if end else None
+    calendar = TradingCalendar.load(get_resource_path("akshare/file_fold/calendar.json"))
+    return await asyncio.to_thread(
+        history.backfill, static_table_path("history"), static_table_path("events"), calendar, start_day, end_day
+    )
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of API-process and changes-worker metrics"""
+    return Response(content=metrics_collector.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 # This must be the last route to catch all other routes
 @app.get("/{rest_of_path:path}")
-async def serve_frontend(rest_of_path: str):
-    dist_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "dist"))
-    # This is the file path to check
-    file_path = os.path.join(dist_dir, rest_of_path)
-
-    # If the file exists and it's a file, serve it
-    if os.path.exists(file_path) and os.path.isfile(file_path):
-        return FileResponse(file_path)
-
-    # Otherwise, it's a route for the SPA, so serve index.html
-    index_path = os.path.join(dist_dir, "index.html")
-    if os.path.exists(index_path):
-        return FileResponse(index_path)
-    
-    # If index.html doesn't exist, then something is wrong with the frontend build
-    raise HTTPException(status_code=404, detail="Frontend not found. Make sure you have built the frontend and the 'dist' directory is correct.")
+async def serve_frontend(request: Request, rest_of_path: str):
+    """从启动时构建的内存清单返回前端文件，按 Accept-Encoding 选择 br/gzip，支持 If-None-Match"""
+    asset = (await load_frontend_manifest()).lookup(rest_of_path)
+    if asset is None:
+        # If index.html doesn't exist, then something is wrong with the frontend build
+        raise HTTPException(status_code=404, detail="Frontend not found. Make sure you have built the frontend and the 'dist' directory is correct.")
+    coding, body = asset.negotiate(request.headers.get("accept-encoding"))
+    headers = {"ETag": asset.variant_etag(coding), "Cache-Control": asset.cache_control}
+    if asset.encoded:
+        headers["Vary"] = "Accept-Encoding"
+    if asset.not_modified(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    if coding is not None:
+        headers["Content-Encoding"] = coding
+    return Response(content=body, media_type=asset.media_type, headers=headers)
+
 
 def get_data_dir():
     """获取用户数据目录"""
@@ -247,44 +718,25 @@ def setup_static_directory():
     return static_dir
 
 
-async def broadcast_message(message: str):
-    """向所有连接的WebSocket客户端广播消息"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    formatted_message = f"[{timestamp}] {message}"
-    log_messages.append(formatted_message)
-    
-    # 广播到所有活动的WebSocket连接
-    disconnected = set()
-    for websocket in active_websockets:
-        try:
-            await websocket.send_text(formatted_message)
-        except Exception:
-            disconnected.add(websocket)
-    
-    # 移除断开的连接
-    active_websockets.difference_update(disconnected)
-
 def output_reader(pipe, name):
-    """从管道读取输出并打印"""
+    """从管道读取输出并打印，同时交给 log_hub 批量广播"""
     for line in pipe:
         message = f"[{name}] {line.strip()}"
         print(message)
-        # 使用asyncio创建一个新的事件循环来发送WebSocket消息
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(broadcast_message(message))
-        loop.close()
+        log_hub.push(message)
 
 
-# Programmatically force shutdown this sidecar.
+# Programmatically shutdown this sidecar.
 def kill_process():
-    global server_instance
-    if server_instance is not None:
-        try:
-            server_instance.should_exit = True  # 通知 Uvicorn 退出
-        except Exception:
-            pass
-    os._exit(0)  # 强制退出整个进程
+    """终止所有 worker 并通知 Uvicorn 退出，主线程随后清理共享内存；服务器没在运行时直接退出"""
+    supervisor.stop()
+    if server_instance is None:
+        os._exit(0)
+    server_instance.should_exit = True  # 通知 Uvicorn 退出
+    # 兜底：服务器没能在 SHUTDOWN_TIMEOUT 秒内退出时强制结束进程
+    watchdog = threading.Timer(SHUTDOWN_TIMEOUT, os._exit, args=(0,))
+    watchdog.daemon = True
+    watchdog.start()
 
 
 # Programmatically startup the api server
@@ -344,14 +796,11 @@ def start_input_thread():
 
 if __name__ == "__main__":
     # 启动时自动以子进程方式调用一次 getConcepts
-    backend_dir = os.path.dirname(os.path.abspath(__file__))
     # 判断当前时间是否晚于9:15，晚于则不启动getConcepts子进程
     now = datetime.now()
     if now.hour < 9 or (now.hour == 9 and now.minute <= 15):
         try:
-            get_concepts_proc = subprocess.Popen([
-                sys.executable, "-c", "from concepts import getConcepts; getConcepts()"
-            ], cwd=backend_dir)
+            get_concepts_worker().start()
             print("[sidecar] 启动时已自动调用 getConcepts 子进程", flush=True)
         except Exception as e:
             print(f"[sidecar] 自动调用 getConcepts 失败: {e}", flush=True)
@@ -360,19 +809,8 @@ if __name__ == "__main__":
 
     static_path = setup_static_directory()
     
-    # Load concepts data at startup
-    try:
-        concepts_path = get_resource_path("static/concepts.csv")
-        concept_df = pd.read_csv(concepts_path)
-        print("[sidecar] Successfully loaded concepts data from: " + concepts_path, flush=True)
-    except Exception as e:
-        print(f"[sidecar] Error loading concepts data: {e}", flush=True)
-        concept_df = pd.DataFrame()  # Create empty DataFrame if loading fails
-
-    # 启动 get_changes_worker_queue 进程，实时写入队列
-    from get_changes_worker_queue import worker as changes_worker
-    get_changes_proc = Process(target=changes_worker, args=(concept_df, buffer_queue, 2), daemon=True)
-    get_changes_proc.start()
+    start_changes_ingestion()
+    supervisor.start()
 
     # Listen for stdin from parent process
     start_input_thread()
@@ -383,3 +821,7 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"[sidecar] Fatal error in main thread: {e}", flush=True)
         sys.exit(1)
+    finally:
+        supervisor.stop()
+        if snapshot_ring is not None:
+            snapshot_ring.close()
@@ -0,0 +1,219 @@
+import bisect
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+# 秒级延迟的默认分桶，覆盖 1ms 到 10s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def samples(self):
+        """[(后缀, 标签值, 额外标签, 值)]"""
+        with self._lock:
+            return [("", labels, (), value) for labels, value in self.values.items()]
+
+    def render(self):
+        samples = self.samples()
+        if not samples:
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, extra, value in samples:
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, labels, extra)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """可以直接 set，也可以 set_function 在抓取时才计算（不抓取就没有任何开销）"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._functions = {}
+
+    def set(self, value, *labels):
+        with self._lock:
+            self.values[labels] = value
+
+    def set_function(self, fn, *labels):
+        self._functions[labels] = fn
+
+    def samples(self):
+        samples = super().samples()
+        for labels, fn in self._functions.items():
+            try:
+                samples.append(("", labels, (), fn()))
+            except Exception:
+                continue
+        return samples
+
+
+class CounterFunction(Gauge):
+    """抓取时才读取的累计值，例如各连接对象上的丢帧计数"""
+
+    kind = "counter"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            state = self.values.get(labels)
+            if state is None:
+                # 各桶计数（非累计）、总和、次数
+                state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for labels, (counts, total, count) in self.values.items():
+                cumulative = 0
+                for bound, n in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += n
+                    samples.append(("_bucket", labels, (("le", _format_value(float(bound))),), cumulative))
+                samples.append(("_sum", labels, (), total))
+                samples.append(("_count", labels, (), count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        # 同名指标在多个模块中声明时共用同一个实例
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def counter_function(self, name, help, labelnames=()):
+        return self._get_or_create(CounterFunction, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._get_or_create(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def render(self, metrics=None):
+        return render(self.metrics.values() if metrics is None else metrics)
+
+
+def render(metrics):
+    lines = []
+    for metric in list(metrics):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+counter_function = REGISTRY.counter_function
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+# changes worker 进程中每轮轮询各阶段的耗时（API 进程的指标使用其他名字，拼接后不会重复）
+STAGE_SECONDS = histogram("sidecar_stage_seconds", "Time spent in each stage of the changes pipeline", ("stage",))
+
+
+class Exporter:
+    """worker 进程把本进程的指标文本定期交给 API 进程
+
+    队列长度为1，API 进程只在 /metrics 被抓取时取走；没人抓取时 worker 每 interval 秒
+    用新的文本替换旧的，抓取到的数据最多落后 interval 秒。
+    只导出 metrics 中列出的指标：fork 出来的 worker 也继承了 API 进程的指标，不能整个注册表导出。
+    """
+
+    def __init__(self, channel, metrics, interval=5.0):
+        self.channel = channel
+        self.metrics = tuple(metrics)
+        self.interval = interval
+        self.last = 0.0
+
+    def maybe_push(self):
+        now = time.monotonic()
+        if now - self.last < self.interval:
+            return
+        self.last = now
+        text = render(self.metrics)
+        try:
+            self.channel.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            self.channel.put_nowait(text)
+        except queue.Full:
+            pass
+
+
+class Collector:
+    """API 进程一侧：抓取时取出 worker 最新的指标文本，和本进程的指标拼在一起"""
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.remote = ""
+
+    def render(self):
+        while True:
+            try:
+                self.remote = self.channel.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                break
+        return REGISTRY.render() + self.remote
@@ -0,0 +1,132 @@
+import json
+import os
+from datetime import date, datetime, time, timedelta, timezone
+
+# A股交易时间以北京时间为准，中国不实行夏令时，固定 UTC+8 即可
+BEIJING = timezone(timedelta(hours=8))
+
+AUCTION_START = time(9, 15)
+MORNING_OPEN = time(9, 30)
+MORNING_CLOSE = time(11, 30)
+AFTERNOON_OPEN = time(13, 0)
+AFTERNOON_CLOSE = time(15, 0)
+# 收盘后再多轮询一会儿，拿到收盘前最后的异动
+CLOSE_GRACE = timedelta(minutes=2)
+# 开盘、午后开盘后的一段时间异动密集，使用最短间隔
+BURST = timedelta(minutes=10)
+# 设为 1 时始终按连续竞价时段轮询，便于收盘后对着本地替身服务器调试和做基准
+ALWAYS_OPEN = os.environ.get("SIDECAR_ALWAYS_OPEN") == "1"
+
+
+class TradingCalendar:
+    """交易日历。calendar.json 为日期列表（或 {"calendar": [...]}），为空时按周一至周五处理"""
+
+    def __init__(self, days=None):
+        self.days = days or set()
+
+    @classmethod
+    def load(cls, path):
+        """读取 calendar.json；path 为 None（资源目录找不到该文件）或文件无法读取时按工作日处理"""
+        if path is None:
+            return cls()
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        if isinstance(data, dict):
+            data = data.get('calendar') or []
+        days = set()
+        for value in data:
+            text = str(value).replace('-', '')[:8]
+            if len(text) == 8 and text.isdigit():
+                days.add(date(int(text[:4]), int(text[4:6]), int(text[6:])))
+        return cls(days)
+
+    def is_trading_day(self, day: date) -> bool:
+        if day in self.days:
+            return True
+        if self.days and day <= max(self.days):
+            return False
+        return day.weekday() < 5
+
+    def trading_days(self, start: date, end: date) -> list:
+        """start 到 end（含）之间的交易日"""
+        days = []
+        day = start
+        while day <= end:
+            if self.is_trading_day(day):
+                days.append(day)
+            day += timedelta(days=1)
+        return days
+
+    def next_trading_day(self, day: date) -> date:
+        day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+
+class AdaptiveScheduler:
+    """根据交易时段、上一轮耗时和新增异动数量决定下一次轮询前的等待时间
+
+    连续竞价时段在 fast 与 slow 之间自适应：有新异动时收紧，连续无新异动时逐步放宽；
+    开盘后的 BURST 时间内固定为 fast；非交易时段一直睡到下一个时段开始（最多 idle_max 秒）。
+    """
+
+    def __init__(self, calendar: TradingCalendar, fast=1.0, normal=2.0, slow=6.0, idle_max=900.0):
+        self.calendar = calendar
+        self.fast = fast
+        self.normal = normal
+        self.slow = slow
+        self.idle_max = idle_max
+        self.current = normal
+
+    def phase(self, now: datetime) -> str:
+        if ALWAYS_OPEN:
+            return 'continuous'
+        if not self.calendar.is_trading_day(now.date()):
+            return 'closed'
+        t = now.time()
+        close = (datetime.combine(now.date(), AFTERNOON_CLOSE) + CLOSE_GRACE).time()
+        if t < AUCTION_START or t >= close:
+            return 'closed'
+        if t < MORNING_OPEN:
+            return 'auction'
+        if MORNING_CLOSE <= t < AFTERNOON_OPEN:
+            return 'lunch'
+        return 'continuous'
+
+    def next_session_start(self, now: datetime) -> datetime:
+        day = now.date()
+        t = now.time()
+        if self.calendar.is_trading_day(day):
+            if t < AUCTION_START:
+                return datetime.combine(day, AUCTION_START, BEIJING)
+            if MORNING_CLOSE <= t < AFTERNOON_OPEN:
+                return datetime.combine(day, AFTERNOON_OPEN, BEIJING)
+        return datetime.combine(self.calendar.next_trading_day(day), AUCTION_START, BEIJING)
+
+    def next_interval(self, now: datetime = None, latency: float = 0.0, new_events: int = 0) -> float:
+        now = now or datetime.now(BEIJING)
+        phase = self.phase(now)
+        if phase in ('closed', 'lunch'):
+            self.current = self.normal
+            wait = (self.next_session_start(now) - now).total_seconds()
+            return max(1.0, min(wait, self.idle_max))
+        if phase == 'auction':
+            interval = self.normal
+        else:
+            opened = datetime.combine(
+                now.date(), MORNING_OPEN if now.time() < MORNING_CLOSE else AFTERNOON_OPEN, BEIJING
+            )
+            if now - opened < BURST:
+                self.current = self.fast
+            elif new_events > 0:
+                # 有新异动时收紧间隔
+                self.current = max(self.fast, self.current / 2)
+            else:
+                self.current = min(self.slow, self.current * 1.5)
+            interval = self.current
+        # 上游响应变慢时不要加压，间隔至少等于上一轮耗时
+        return max(interval, latency)
@@ -0,0 +1,74 @@
+import struct
+from multiprocessing import shared_memory
+
+# 每个槽位的头部：seq（0 表示正在写入）、数据长度
+SLOT_HEADER = struct.Struct("<QQ")
+
+
+class SnapshotRing:
+    """worker 与 API 进程之间的共享内存环形缓冲区
+
+    worker 把编码好的快照字节写入下一个槽位，然后只通过队列发送 (seq, slot) 这样的小消息；
+    API 进程按槽位直接读取字节，不再经过 pickle 和重新编码。
+    写入前先把槽位 seq 清零，读取前后各检查一次 seq，被覆盖的槽位会被识别并丢弃。
+    """
+
+    def __init__(self, shm, slots, slot_size, owner):
+        self.shm = shm
+        self.slots = slots
+        self.slot_size = slot_size
+        self.owner = owner
+        self.seq = 0
+
+    @classmethod
+    def create(cls, slots=4, slot_size=8 * 1024 * 1024):
+        shm = shared_memory.SharedMemory(create=True, size=slots * (SLOT_HEADER.size + slot_size))
+        return cls(shm, slots, slot_size, owner=True)
+
+    @classmethod
+    def attach(cls, name, slots=4, slot_size=8 * 1024 * 1024):
+        # 由创建方负责 unlink，子进程不注册到 resource_tracker，退出时不会误删
+        shm = shared_memory.SharedMemory(name=name, track=False)
+        ring = cls(shm, slots, slot_size, owner=False)
+        # 重启后的 worker 从已有的最大 seq 继续编号，旧消息不会读到新快照
+        ring.seq = max(SLOT_HEADER.unpack_from(shm.buf, ring._offset(i))[0] for i in range(slots))
+        return ring
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def _offset(self, slot):
+        return slot * (SLOT_HEADER.size + self.slot_size)
+
+    def publish(self, payload: bytes):
+        """写入一个快照，返回 (seq, slot)；超过槽位容量时返回 None，由调用方改走队列"""
+        if len(payload) > self.slot_size:
+            return None
+        self.seq += 1
+        slot = self.seq % self.slots
+        offset = self._offset(slot)
+        buf = self.shm.buf
+        SLOT_HEADER.pack_into(buf, offset, 0, 0)
+        data_offset = offset + SLOT_HEADER.size
+        buf[data_offset:data_offset + len(payload)] = payload
+        SLOT_HEADER.pack_into(buf, offset, self.seq, len(payload))
+        return self.seq, slot
+
+    def read(self, seq, slot):
+        """读取指定快照的字节，槽位已被更新的快照覆盖时返回 None"""
+        offset = self._offset(slot)
+        buf = self.shm.buf
+        current_seq, length = SLOT_HEADER.unpack_from(buf, offset)
+        if current_seq != seq:
+            return None
+        data_offset = offset + SLOT_HEADER.size
+        payload = bytes(buf[data_offset:data_offset + length])
+        if SLOT_HEADER.unpack_from(buf, offset)[0] != seq:
+            return None
+        return payload
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,113 @@
+import csv
+import importlib.util
+import os
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas 和 pyarrow 在第一次读写时才导入，API 进程启动时不加载；pyarrow 是可选依赖，缺失时退回 CSV
+HAS_ARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+def _pyarrow():
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401  确保 pa.ipc 可用
+    return pa
+
+
+class CsvStore:
+    """CSV 存储，兼容旧文件，也是没有 pyarrow 时的默认实现"""
+
+    suffix = ".csv"
+
+    def write(self, path: str, df: "pd.DataFrame") -> None:
+        df.to_csv(path, index=False)
+
+    def read_frame(self, path: str, columns=None) -> "pd.DataFrame":
+        import pandas as pd
+        return pd.read_csv(path, usecols=columns)
+
+    def read_records(self, path: str) -> list:
+        # 不经过 pandas，空值转为 None
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        for row in rows:
+            for key, value in row.items():
+                if value == "":
+                    row[key] = None
+        return rows
+
+
+class ArrowStore:
+    """Arrow IPC 文件存储，读取时内存映射，无需解析文本"""
+
+    suffix = ".arrow"
+
+    def write(self, path: str, df: "pd.DataFrame") -> None:
+        pa = _pyarrow()
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    def read_table(self, path: str):
+        pa = _pyarrow()
+        with pa.memory_map(path, "r") as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def read_frame(self, path: str, columns=None) -> "pd.DataFrame":
+        table = self.read_table(path)
+        return (table if columns is None else table.select(columns)).to_pandas()
+
+    def read_records(self, path: str) -> list:
+        return self.read_table(path).to_pylist()
+
+
+STORES = {"csv": CsvStore()}
+if HAS_ARROW:
+    STORES["arrow"] = ArrowStore()
+
+
+def get_store(kind: str = None):
+    """按 SIDECAR_STORAGE 环境变量选择存储格式，默认有 pyarrow 时用 Arrow"""
+    kind = kind or os.environ.get("SIDECAR_STORAGE") or ("arrow" if "arrow" in STORES else "csv")
+    if kind not in STORES:
+        raise ValueError(f"不支持的存储格式: {kind}")
+    return STORES[kind]
+
+
+def write_table(base_path: str, df: "pd.DataFrame", kind: str = None) -> str:
+    """把 df 写到 base_path + 后缀。先写临时文件并 fsync，再原子替换，崩溃时读者只会看到旧文件或新文件"""
+    store = get_store(kind)
+    path = base_path + store.suffix
+    tmp_path = f"{path}.tmp"
+    store.write(tmp_path, df)
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return path
+
+
+def find_table(base_path: str):
+    """返回 base_path 对应的已有文件及其存储实现，优先当前格式，其次其他格式（兼容旧的 CSV）"""
+    preferred = get_store()
+    for store in [preferred] + [s for s in STORES.values() if s is not preferred]:
+        path = base_path + store.suffix
+        if os.path.exists(path):
+            return path, store
+    return None, None
+
+
+def read_frame(base_path: str) -> "pd.DataFrame":
+    path, store = find_table(base_path)
+    if path is None:
+        raise FileNotFoundError(f"{base_path}.*")
+    return store.read_frame(path)
+
+
+def read_records(base_path: str) -> list:
+    path, store = find_table(base_path)
+    if path is None:
+        raise FileNotFoundError(f"{base_path}.*")
+    return store.read_records(path)
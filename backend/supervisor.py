@@ -0,0 +1,267 @@
+import threading
+import time
+from multiprocessing import Array, Event
+
+# Heartbeat 共享数组中各字段的下标
+STARTED, LAST_BEAT, LAST_SUCCESS, LATENCY, ERRORS, TICKS, NEXT_IN = range(7)
+
+
+class Heartbeat:
+    """worker 进程写、supervisor 读的心跳，存放在共享内存数组中
+
+    worker 每轮结束时调用 beat，同时告知下一次心跳前预计等待的秒数，
+    supervisor 据此区分正常的长时间休眠（休市）与卡死。
+    stop 是 supervisor 请求 worker 退出的标志，worker 在两轮之间用 stop.wait 代替 sleep。
+    """
+
+    def __init__(self):
+        self.values = Array('d', 7)
+        self.stop = Event()
+
+    def reset(self):
+        self.stop.clear()
+        with self.values.get_lock():
+            for i in range(len(self.values)):
+                self.values[i] = 0.0
+
+    def start(self, expected: float = 0.0):
+        """worker 完成初始化后调用"""
+        now = time.time()
+        with self.values.get_lock():
+            self.values[STARTED] = now
+            self.values[LAST_BEAT] = now
+            self.values[NEXT_IN] = expected
+
+    def beat(self, ok: bool, latency: float, next_in: float):
+        now = time.time()
+        with self.values.get_lock():
+            self.values[LAST_BEAT] = now
+            self.values[LATENCY] = latency
+            self.values[TICKS] += 1
+            self.values[NEXT_IN] = next_in
+            if ok:
+                self.values[LAST_SUCCESS] = now
+            else:
+                self.values[ERRORS] += 1
+
+    def snapshot(self):
+        with self.values.get_lock():
+            return list(self.values)
+
+    def status(self, now=None):
+        now = now or time.time()
+        values = self.snapshot()
+        return {
+            "last_heartbeat": format_timestamp(values[LAST_BEAT]),
+            "last_success": format_timestamp(values[LAST_SUCCESS]),
+            "seconds_since_success": round(now - values[LAST_SUCCESS], 1) if values[LAST_SUCCESS] else None,
+            "cycle_latency": round(values[LATENCY], 3),
+            "ticks": int(values[TICKS]),
+            "errors": int(values[ERRORS]),
+        }
+
+
+def format_timestamp(value):
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(value)) if value else None
+
+
+class ManagedWorker:
+    """被监管的 worker：由 factory 创建并启动进程，退出或心跳超时时按指数退避重启
+
+    factory(heartbeat) 返回已启动的 multiprocessing.Process 或 subprocess.Popen。
+    heartbeat=False 的 worker（如一次性的 getConcepts）只监视退出码；
+    restart="on-failure" 时只在非零退出时重启；连续失败 max_restarts 次后不再重启。
+    """
+
+    def __init__(self, name, factory, heartbeat=True, restart="always", startup_timeout=120.0,
+                 hang_timeout=60.0, backoff_min=1.0, backoff_max=60.0, stable_after=300.0, max_restarts=None):
+        self.name = name
+        self.factory = factory
+        self.heartbeat = Heartbeat() if heartbeat else None
+        self.restart = restart
+        self.startup_timeout = startup_timeout
+        self.hang_timeout = hang_timeout
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.stable_after = stable_after
+        self.max_restarts = max_restarts
+        self.proc = None
+        self.state = "stopped"
+        self.restarts = 0
+        self.failures = 0  # 连续失败次数，决定退避时长
+        self.exit_code = None
+        self.last_error = None
+        self.started_at = None
+        self.restart_at = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """（重新）启动进程，手动启动会清零连续失败次数"""
+        with self._lock:
+            self.failures = 0
+            self.last_error = None
+            self._spawn()
+
+    def _spawn(self):
+        if self.heartbeat is not None:
+            self.heartbeat.reset()
+        self.proc = self.factory(self.heartbeat)
+        self.state = "running"
+        self.exit_code = None
+        self.started_at = time.time()
+        self.restart_at = None
+
+    def _exit_code(self):
+        if self.proc is None:
+            return None
+        if hasattr(self.proc, "poll"):  # subprocess.Popen
+            return self.proc.poll()
+        return self.proc.exitcode
+
+    def _stop_proc(self, timeout=5.0):
+        proc = self.proc
+        if proc is None or self._exit_code() is not None:
+            return
+        # 先设置停止标志，worker 结束当前一轮、落盘后自行退出；
+        # Windows 上 terminate 是 TerminateProcess，不会触发 worker 的 SIGTERM 处理
+        if self.heartbeat is not None:
+            self.heartbeat.stop.set()
+            self._wait(proc, timeout)
+        if self._exit_code() is None:
+            proc.terminate()
+            self._wait(proc, timeout)
+        if self._exit_code() is None:
+            proc.kill()
+
+    @staticmethod
+    def _wait(proc, timeout):
+        try:
+            if hasattr(proc, "poll"):
+                proc.wait(timeout)
+            else:
+                proc.join(timeout)
+        except Exception:
+            pass
+
+    def _stalled(self, now):
+        """心跳超时判断：启动阶段用 startup_timeout，之后允许 worker 声明的等待时间再加 hang_timeout"""
+        if self.heartbeat is None:
+            return False
+        values = self.heartbeat.snapshot()
+        if not values[STARTED]:
+            return now - self.started_at > self.startup_timeout
+        return now - values[LAST_BEAT] > values[NEXT_IN] + self.hang_timeout
+
+    def check(self, now=None):
+        """由 Supervisor 定期调用"""
+        now = now or time.time()
+        with self._lock:
+            if self.state == "backoff":
+                if now >= self.restart_at:
+                    self.restarts += 1
+                    try:
+                        self._spawn()
+                    except Exception as e:
+                        self.last_error = f"restart failed: {e}"
+                        self._schedule_restart(now)
+                return
+            if self.state != "running":
+                return
+            code = self._exit_code()
+            reason = None
+            if code is None and self._stalled(now):
+                reason = "heartbeat timeout"
+                print(f"[supervisor] {self.name} 心跳超时，终止进程 pid={self.proc.pid}", flush=True)
+                self._stop_proc()
+                code = self._exit_code()
+            if code is None:
+                # 稳定运行一段时间后清零连续失败次数
+                if self.failures and now - self.started_at > self.stable_after:
+                    self.failures = 0
+                return
+            self.exit_code = code
+            if code == 0 and reason is None and self.restart == "on-failure":
+                self.state = "exited"
+                return
+            self.last_error = reason or f"exited with code {code}"
+            if self.max_restarts is not None and self.failures >= self.max_restarts:
+                self.state = "failed"
+                print(f"[supervisor] {self.name} {self.last_error}，连续失败次数已达上限", flush=True)
+                return
+            self._schedule_restart(now)
+            print(f"[supervisor] {self.name} {self.last_error}，{self.restart_at - now:.0f} 秒后重启", flush=True)
+
+    def _schedule_restart(self, now):
+        delay = min(self.backoff_max, self.backoff_min * 2 ** self.failures)
+        self.failures += 1
+        self.state = "backoff"
+        self.restart_at = now + delay
+
+    def stop(self, timeout=5.0):
+        with self._lock:
+            self._stop_proc(timeout)
+            if self.proc is not None:
+                self.exit_code = self._exit_code()
+            self.state = "stopped"
+
+    def is_running(self):
+        return self.state == "running" and self._exit_code() is None
+
+    def status(self):
+        now = time.time()
+        status = {
+            "name": self.name,
+            "state": self.state,
+            "pid": self.proc.pid if self.proc is not None else None,
+            "started_at": format_timestamp(self.started_at),
+            "restarts": self.restarts,
+            "exit_code": self.exit_code,
+            "last_error": self.last_error,
+        }
+        if self.state == "backoff":
+            status["restart_in"] = round(max(0.0, self.restart_at - now), 1)
+        if self.heartbeat is not None:
+            status.update(self.heartbeat.status(now))
+        return status
+
+
+class Supervisor:
+    """在后台线程中每 interval 秒检查一次所有 worker"""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.workers = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, worker: ManagedWorker, start=True):
+        self.workers[worker.name] = worker
+        if start:
+            worker.start()
+        return worker
+
+    def get(self, name):
+        return self.workers.get(name)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="supervisor", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for worker in list(self.workers.values()):
+                try:
+                    worker.check()
+                except Exception as e:
+                    print(f"[supervisor] 检查 {worker.name} 出错: {e}", flush=True)
+
+    def stop(self, timeout=5.0):
+        """停止监控并终止所有 worker，不再重启"""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        for worker in self.workers.values():
+            worker.stop(timeout)
+
+    def status(self):
+        return {name: worker.status() for name, worker in self.workers.items()}